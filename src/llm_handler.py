@@ -2,7 +2,7 @@ import os
 import asyncio
 import litellm
 from openai import AsyncOpenAI
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set, Tuple
 
 # --- Model-specific configurations for OpenAI-compatible endpoints ---
 MODEL_CONFIG = {
@@ -25,6 +25,37 @@ MODEL_CONFIG = {
     # Models not in this list (anthropic, gemini, xai) will use the standard litellm call.
 }
 
+# One client per provider, so concurrent agents share its keep-alive connection pool.
+# Pooled connections belong to the event loop that opened them, so each entry
+# remembers its loop and is rebuilt when called from a different one.
+_CLIENTS: Dict[str, Tuple[asyncio.AbstractEventLoop, AsyncOpenAI]] = {}
+_CLOSING: Set[asyncio.Future] = set() # Strong refs to pending close() tasks so they aren't garbage-collected mid-run
+
+def _close_client(loop: asyncio.AbstractEventLoop, client: AsyncOpenAI):
+    """Closes a replaced client's connection pool on the loop that owns it."""
+    if loop.is_closed():
+        return # Its transports went down with the loop; nothing left to await
+    if loop is asyncio.get_running_loop():
+        task = loop.create_task(client.close())
+    elif loop.is_running():
+        task = asyncio.run_coroutine_threadsafe(client.close(), loop)
+    else:
+        return # A stopped loop can't be driven from inside this one; the sockets close when the client is collected
+    _CLOSING.add(task)
+    task.add_done_callback(_CLOSING.discard)
+
+def _get_client(provider: str, api_key: str) -> AsyncOpenAI:
+    """Returns the cached OpenAI-compatible client for a provider, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    cached = _CLIENTS.get(provider)
+    if cached is not None:
+        if cached[0] is loop and cached[1].api_key == api_key:
+            return cached[1]
+        _close_client(*cached)
+    client = AsyncOpenAI(api_key=api_key, base_url=MODEL_CONFIG[provider]["base_url"])
+    _CLIENTS[provider] = (loop, client)
+    return client
+
 async def unified_llm_call(model_name: str, messages: List[Dict], timeout: int = 600) -> Optional[str]:
     """
     A centralized function to call any LLM, handling different provider conventions.
@@ -46,7 +77,7 @@ async def unified_llm_call(model_name: str, messages: List[Dict], timeout: int =
                     return None
 
                 api_model_name = model_name.split('/')[-1]
-                client = AsyncOpenAI(api_key=api_key, base_url=config["base_url"])
+                client = _get_client(provider, api_key)
                 
                 response = await client.chat.completions.create(
                     model=api_model_name,
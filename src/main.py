@@ -8,6 +8,34 @@ PYTHON_EXEC = sys.executable # Use the same python that is running this script
 # Get the absolute path to the project root directory (which is one level up from this script)
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 BASE_OUTPUT_DIR = os.path.join(PROJECT_ROOT, "outputs")
+# Absolute paths for all intermediate files; they never change between runs.
+SCRIPT_FILE = os.path.join(BASE_OUTPUT_DIR, "final_script.json")
+AUDIO_DIR = os.path.join(BASE_OUTPUT_DIR, "generated_audio")
+METADATA_FILE = os.path.join(BASE_OUTPUT_DIR, "audio_metadata.json")
+SUBTITLE_FILE = os.path.join(BASE_OUTPUT_DIR, "subtitles.json")
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def _write_all(fd: int, data: bytes):
+    """Writes all of data to a raw file descriptor, retrying on short writes."""
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+def _stdout_writer():
+    """
+    Returns a function that writes raw bytes to our stdout: straight to its fd when it has one,
+    otherwise (stdout replaced by an IDE console or a wrapper) through its binary buffer.
+    """
+    try:
+        stdout_fd = sys.stdout.fileno()
+    except (AttributeError, OSError, ValueError): # io.UnsupportedOperation is both an OSError and a ValueError
+        def write(chunk: bytes):
+            sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+        return write
+    return lambda chunk: _write_all(stdout_fd, chunk)
 
 def run_step(command: list, step_name: str):
     """
@@ -22,23 +50,27 @@ def run_step(command: list, step_name: str):
     
     print(f"Executing command: {' '.join(command)}\n")
     
+    process = None
     try:
-        # Use Popen to stream output in real-time
-        # Set the current working directory to the project root
+        # Use Popen to stream output in real-time.
+        # The child inherits our working directory (the project root, see main()).
+        # Leaving cwd unset and close_fds off lets CPython launch the child via
+        # posix_spawn instead of fork+exec; fds opened by Python are
+        # non-inheritable by default, so nothing leaks into the child.
         process = subprocess.Popen(
             command,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT, # Redirect stderr to stdout
-            text=True,
-            encoding='utf-8',
-            bufsize=1, # Line-buffered
-            cwd=PROJECT_ROOT 
+            close_fds=False
         )
 
-        # Stream the output line by line
+        # Stream the raw output in large chunks straight to our stdout fd,
+        # bypassing the TextIO layer. Flush first so earlier prints stay in order.
         if process.stdout:
-            for line in iter(process.stdout.readline, ''):
-                print(line, end='', flush=True)
+            sys.stdout.flush()
+            write = _stdout_writer()
+            for chunk in iter(lambda: process.stdout.read1(STREAM_CHUNK_SIZE), b''):
+                write(chunk)
         
         # Wait for the process to finish and get the exit code
         process.wait() 
@@ -60,27 +92,31 @@ def run_step(command: list, step_name: str):
     except Exception as e:
         print(f"\nAn unexpected error occurred during step '{step_name}': {e}")
         return False
+    finally:
+        # On any early exit (a failed write, Ctrl+C) don't leave the step running in the background.
+        if process is not None:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            if process.stdout:
+                process.stdout.close()
 
 
 def main(input_log_file: str, output_video_file: str, stt_engine: str = 'google'):
     """Runs the full video generation pipeline."""
     
     # --- Path Setup ---
+    # All steps run from the project root; child processes inherit this cwd.
+    os.chdir(PROJECT_ROOT)
+
     # Ensure the base output directory exists
     os.makedirs(BASE_OUTPUT_DIR, exist_ok=True)
     
-    # Define paths for all intermediate and final files
-    # Make all paths absolute from the project root
-    script_file = os.path.join(BASE_OUTPUT_DIR, "final_script.json")
-    audio_dir = os.path.join(BASE_OUTPUT_DIR, "generated_audio")
-    metadata_file = os.path.join(BASE_OUTPUT_DIR, "audio_metadata.json")
-    subtitle_file = os.path.join(BASE_OUTPUT_DIR, "subtitles.json")
-    
     # Ensure the audio directory is clean
-    os.makedirs(audio_dir, exist_ok=True)
-    for f in os.listdir(audio_dir):
-        os.remove(os.path.join(audio_dir, f))
-    print(f"Cleaned audio directory: {audio_dir}")
+    os.makedirs(AUDIO_DIR, exist_ok=True)
+    for f in os.listdir(AUDIO_DIR):
+        os.remove(os.path.join(AUDIO_DIR, f))
+    print(f"Cleaned audio directory: {AUDIO_DIR}")
 
     # --- Pipeline Steps ---
     
@@ -88,7 +124,7 @@ def main(input_log_file: str, output_video_file: str, stt_engine: str = 'google'
     # cmd_script = [
     #     PYTHON_EXEC, "tools/script_writer.py",
     #     input_log_file,
-    #     script_file
+    #     SCRIPT_FILE
     # ]
     # if not run_step(cmd_script, "Script Generation"):
     #     return
@@ -97,9 +133,9 @@ def main(input_log_file: str, output_video_file: str, stt_engine: str = 'google'
     # 2. Audio Generation
     cmd_audio = [
         PYTHON_EXEC, "tools/audio_generator.py",
-        script_file,
-        audio_dir,
-        metadata_file
+        SCRIPT_FILE,
+        AUDIO_DIR,
+        METADATA_FILE
     ]
     if not run_step(cmd_audio, "Audio Generation"):
         return
@@ -107,8 +143,8 @@ def main(input_log_file: str, output_video_file: str, stt_engine: str = 'google'
     # 3. Subtitle Generation
     cmd_subtitle = [
         PYTHON_EXEC, "tools/subtitle_generator.py",
-        metadata_file,
-        subtitle_file,
+        METADATA_FILE,
+        SUBTITLE_FILE,
         "--stt_engine", stt_engine
     ]
     if not run_step(cmd_subtitle, "Subtitle Generation"):
@@ -117,9 +153,9 @@ def main(input_log_file: str, output_video_file: str, stt_engine: str = 'google'
     # 4. Video Generation
     cmd_video = [
         PYTHON_EXEC, "tools/video_generator.py",
-        script_file,
-        metadata_file,
-        subtitle_file,
+        SCRIPT_FILE,
+        METADATA_FILE,
+        SUBTITLE_FILE,
         output_video_file
     ]
     if not run_step(cmd_video, "Video Generation"):
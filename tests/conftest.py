@@ -0,0 +1,92 @@
+import asyncio
+import inspect
+import os
+import sys
+
+import pytest
+
+# Ensure the project root is in the system path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def runner():
+    """
+    One event loop for the whole session, so warm HTTP clients and their
+    keep-alive connections survive from one test to the next.
+    """
+    with asyncio.Runner() as r:
+        session = None
+        try:
+            import httpx
+            import litellm
+        except ImportError:
+            pass
+        else:
+            session = httpx.AsyncClient(limits=httpx.Limits(max_connections=64, max_keepalive_connections=32))
+            litellm.aclient_session = session
+        yield r
+        if session is not None:
+            r.run(session.aclose())
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--run-live", action="store_true", default=False,
+        help="run tests marked 'live', which call real (paid) LLM APIs",
+    )
+
+
+def pytest_ignore_collect(collection_path, config):
+    # tests/temp_tests holds ad-hoc provider scripts, some of which call an API at import time,
+    # so the directory is only collected for a live run.
+    if collection_path.name == "temp_tests" and not config.getoption("--run-live"):
+        return True
+    return None
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "live: calls real LLM APIs; skipped unless --run-live is given")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-live"):
+        return
+    skip_live = pytest.mark.skip(reason="live API test; pass --run-live to run it")
+    for item in items:
+        if "live" in item.keywords:
+            item.add_marker(skip_live)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """
+    Runs `async def` tests on the shared session runner when the test module
+    requests it (pytest.mark.usefixtures("runner")), otherwise on a fresh loop.
+    """
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    params = inspect.signature(pyfuncitem.obj).parameters
+    kwargs = {name: pyfuncitem.funcargs[name] for name in params}
+    session_runner = pyfuncitem.funcargs.get("runner")
+    if session_runner is not None:
+        session_runner.run(pyfuncitem.obj(**kwargs))
+    else:
+        asyncio.run(pyfuncitem.obj(**kwargs))
+    return True
+
+
+def pytest_generate_tests(metafunc):
+    """
+    Parametrizes per-model tests from the module's MODELS_TO_TEST list, so each
+    model becomes its own test item (and can be sharded with pytest-xdist -n auto).
+    """
+    models = getattr(metafunc.module, "MODELS_TO_TEST", None)
+    if not models:
+        return
+    if "model_name" in metafunc.fixturenames and "player_id" in metafunc.fixturenames:
+        metafunc.parametrize(
+            ("model_name", "player_id"),
+            [(model, i) for i, model in enumerate(models)],
+            ids=models,
+        )
@@ -2,6 +2,7 @@ import asyncio
 import os
 import sys
 import logging
+import pytest
 
 # Ensure the project root is in the system path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -18,6 +19,9 @@ from src.agent import (
 # Load environment variables from .env file
 load_dotenv()
 
+# Under pytest these are paid API calls: skipped unless --run-live is given (see tests/conftest.py).
+pytestmark = pytest.mark.live
+
 # --- Test Configuration ---
 # We will test only the Anthropic model this time.
 MODEL_TO_TEST = "anthropic/claude-3-haiku-20240307"
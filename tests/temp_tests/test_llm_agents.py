@@ -2,6 +2,7 @@ import asyncio
 import os
 import sys
 import logging
+import pytest
 from typing import List
 
 # Ensure the project root is in the system path
@@ -19,6 +20,9 @@ from src.agent import (
 # Load environment variables from .env file
 load_dotenv()
 
+# Under pytest these are paid API calls: skipped unless --run-live is given (see tests/conftest.py).
+pytestmark = pytest.mark.live
+
 # --- Test Configuration ---
 # A list of models to test concurrently.
 # LiteLLM will use the corresponding environment variables for keys (e.g., OPENAI_API_KEY, GEMINI_API_KEY)
@@ -29,6 +33,8 @@ MODELS_TO_TEST = [
     "groq/llama3-8b-8192",
     "anthropic/claude-3-haiku-20240307" # Added Claude as another provider
 ]
+# Upper bound for a single agent's round trip, so one stuck provider can't stall the run.
+AGENT_TIMEOUT_SECONDS = 60
 
 async def test_single_agent(model_name: str, player_id: int):
     """
@@ -86,6 +92,19 @@ async def test_single_agent(model_name: str, player_id: int):
         return model_name, "Error: No valid response received."
 
 
+async def run_with_timeout(model_name: str, player_id: int, results: list):
+    """
+    Runs a single agent test under a timeout. Failures are stored in the
+    result slot instead of propagating, so they don't cancel the other tests.
+    """
+    try:
+        results[player_id] = await asyncio.wait_for(test_single_agent(model_name, player_id), timeout=AGENT_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        results[player_id] = TimeoutError(f"{model_name} timed out after {AGENT_TIMEOUT_SECONDS} seconds")
+    except Exception as e:
+        results[player_id] = e
+
+
 async def main():
     """
     Runs connectivity tests for all specified LLM agents concurrently.
@@ -94,11 +113,11 @@ async def main():
     print(f"Testing {len(MODELS_TO_TEST)} models concurrently...")
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 
-    # Create a list of concurrent tasks
-    tasks = [test_single_agent(model, i) for i, model in enumerate(MODELS_TO_TEST)]
-    
-    # Run all tests in parallel
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    # Run all tests in parallel, each bounded by AGENT_TIMEOUT_SECONDS
+    results = [None] * len(MODELS_TO_TEST)
+    async with asyncio.TaskGroup() as tg:
+        for i, model in enumerate(MODELS_TO_TEST):
+            tg.create_task(run_with_timeout(model, i, results))
     
     print("\n--- Test Results ---")
     all_passed = True
@@ -7,6 +7,7 @@ from typing import List
 # Ensure the project root is in the system path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import pytest
 from dotenv import load_dotenv
 from src.agent import (
     RoleAgent,
@@ -29,6 +30,11 @@ MODELS_TO_TEST = [
     "xai/grok-4-latest",
     "deepseek/deepseek-chat",
 ]
+# Upper bound for a single agent's round trip, so one stuck provider can't stall the run.
+AGENT_TIMEOUT_SECONDS = 60
+
+# Under pytest these are paid API calls: skipped unless --run-live is given (see tests/conftest.py).
+pytestmark = [pytest.mark.live, pytest.mark.usefixtures("runner")]
 
 async def test_single_agent(model_name: str, player_id: int):
     """
@@ -86,6 +92,25 @@ async def test_single_agent(model_name: str, player_id: int):
         return model_name, f"Error: An exception occurred - {e}"
 
 
+# Helper shared by main() and test_agent_responds, not a test itself.
+test_single_agent.__test__ = False
+
+
+async def test_agent_responds(model_name: str, player_id: int):
+    """Each model must answer the discussion request with a non-empty statement."""
+    _, statement = await asyncio.wait_for(test_single_agent(model_name, player_id), timeout=AGENT_TIMEOUT_SECONDS)
+    assert statement and not statement.startswith("Error:"), statement
+
+
+async def run_with_timeout(model_name: str, player_id: int, results: list):
+    """Runs a single agent test, recording a timeout as an error result in its slot."""
+    try:
+        results[player_id] = await asyncio.wait_for(test_single_agent(model_name, player_id), timeout=AGENT_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logging.error(f"[Test for {model_name}]: Timed out after {AGENT_TIMEOUT_SECONDS}s.")
+        results[player_id] = (model_name, f"Error: Timed out after {AGENT_TIMEOUT_SECONDS} seconds.")
+
+
 async def main():
     """
     Runs connectivity tests for all specified LLM agents concurrently.
@@ -93,8 +118,10 @@ async def main():
     print("--- LLM Agent Connectivity Test ---")
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 
-    tasks = [test_single_agent(model, i) for i, model in enumerate(MODELS_TO_TEST)]
-    results = await asyncio.gather(*tasks)
+    results = [None] * len(MODELS_TO_TEST)
+    async with asyncio.TaskGroup() as tg:
+        for i, model in enumerate(MODELS_TO_TEST):
+            tg.create_task(run_with_timeout(model, i, results))
     
     print("\n--- Test Results ---")
     all_passed = True
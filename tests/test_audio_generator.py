@@ -0,0 +1,109 @@
+"""
+Unit tests for the byte-level helpers in audio_generator: splitting long TTS text under the
+request byte limit, and reading a CBR MP3's duration from its frame header.
+"""
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("google.cloud.texttospeech")
+pytest.importorskip("yaml")
+
+from tools.audio_generator import find_split_point, mp3_duration_ms, split_text_by_bytes
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no CRC: every frame is 417 bytes.
+MP3_FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0x00])
+MP3_FRAME_SIZE = 417
+
+
+def make_cbr_mp3(frames: int) -> bytes:
+    return (MP3_FRAME_HEADER + bytes(MP3_FRAME_SIZE - len(MP3_FRAME_HEADER))) * frames
+
+
+def make_id3v2_tag(payload_size: int) -> bytes:
+    # The tag size is a 28-bit "syncsafe" integer: 7 bits per byte.
+    size = bytes((payload_size >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return b"ID3\x04\x00\x00" + size + b"\x00" * payload_size
+
+
+def make_id3v1_tag() -> bytes:
+    return b"TAG" + b"\x00" * 125
+
+
+# --- find_split_point ---
+
+def test_find_split_point_prefers_sentence_end():
+    buf = b"One, two. Three four"
+    assert buf[:find_split_point(buf, 0, len(buf) - 1)] == b"One, two."
+
+
+def test_find_split_point_falls_back_to_clause_then_space():
+    buf = b"One two, three four five"
+    assert buf[:find_split_point(buf, 0, len(buf) - 1)] == b"One two,"
+    buf = b"One two three four"
+    assert buf[:find_split_point(buf, 0, len(buf) - 1)] == b"One two three"
+
+
+def test_find_split_point_never_cuts_a_multibyte_character():
+    buf = "aé".encode("utf-8") + b"b"  # b'a\xc3\xa9b'
+    assert find_split_point(buf, 0, 2) == 1
+    buf = "你好".encode("utf-8")
+    assert find_split_point(buf, 0, 4) == 3
+
+
+# --- split_text_by_bytes ---
+
+def test_split_text_by_bytes_keeps_short_text_whole():
+    assert split_text_by_bytes("Hello there.", limit=100) == ["Hello there."]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Merlin knows. " * 40,
+        "word " * 200,
+        "é" * 301,
+        "你好，世界。" * 50,
+        "emoji 😀 mixed with ascii, and clauses; " * 20,
+    ],
+    ids=["sentences", "words", "two_byte_no_spaces", "cjk", "four_byte"],
+)
+@pytest.mark.parametrize("limit", [9, 64, 250])
+def test_split_text_by_bytes_respects_limit_and_character_boundaries(text, limit):
+    chunks = split_text_by_bytes(text, limit=limit)
+    assert all(len(chunk.encode("utf-8")) <= limit for chunk in chunks)
+    # Splitting only drops the whitespace at the seams: no characters are lost, added or mangled.
+    assert "".join(chunks).replace(" ", "") == text.replace(" ", "")
+
+
+def test_split_text_by_bytes_splits_on_sentence_boundaries():
+    text = "First sentence here. Second sentence here. Third one."
+    assert split_text_by_bytes(text, limit=45) == ["First sentence here. Second sentence here.", "Third one."]
+
+
+# --- mp3_duration_ms ---
+
+def test_mp3_duration_ms_cbr():
+    # 100 frames x 417 bytes x 8 bits / 128 kbps
+    assert mp3_duration_ms(make_cbr_mp3(100)) == int(100 * MP3_FRAME_SIZE * 8 / 128)
+
+
+def test_mp3_duration_ms_ignores_id3_tags():
+    audio = make_cbr_mp3(100)
+    expected = mp3_duration_ms(audio)
+    assert mp3_duration_ms(make_id3v2_tag(300) + audio) == expected
+    assert mp3_duration_ms(audio + make_id3v1_tag()) == expected
+    assert mp3_duration_ms(make_id3v2_tag(300) + audio + make_id3v1_tag()) == expected
+
+
+def test_mp3_duration_ms_skips_sync_bytes_inside_the_id3v2_tag():
+    # An 0xFF byte in the tag payload must not be mistaken for a frame header.
+    tag = bytearray(make_id3v2_tag(64))
+    tag[20:24] = MP3_FRAME_HEADER
+    audio = make_cbr_mp3(10)
+    assert mp3_duration_ms(bytes(tag) + audio) == mp3_duration_ms(audio)
+
+
+def test_mp3_duration_ms_rejects_data_without_frames():
+    with pytest.raises(ValueError):
+        mp3_duration_ms(b"\x00" * 1000)
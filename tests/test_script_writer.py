@@ -0,0 +1,194 @@
+"""
+Unit tests for script_writer's local helpers: chunk packing, reply parsing and event validation.
+No request reaches Gemini; the end-to-end cases use a fake model.
+"""
+
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+from tools import script_writer
+from tools.script_writer import extract_json_text, pack_chunks, salvage_json_array, split_log_into_chunks, validate_events
+
+NARRATION = {"event_type": "NARRATOR_SPEECH", "summary": "Quest 1 begins.", "content": "The first quest begins."}
+SPEECH = {"event_type": "PLAYER_SPEECH", "player_id": 2, "summary": "Player 2 approves.", "content": "I approve."}
+
+
+# --- split_log_into_chunks ---
+
+# The lookahead split the chunker replaced; chunk boundaries (and so LLM cache keys) must not change.
+_BASELINE_SPLIT_RE = re.compile(r"(?=--- Starting Quest|--- Team Building Attempt|--- Team Discussion|--- Leader's Final Decision|--- The Final Assassination|--- MVP Selection ---)")
+
+CHUNKING_LOG = (
+    "Game start\n"
+    "--- Starting Quest 1 ---\n"
+    "--- Team Building Attempt 1 (Leader: Player 2) ---\n"
+    "Player 0 (Merlin) says: fine --- Team Discussion starts mid-line\n"
+    "--- Leader's Final Decision ---\n"
+    "--- The Final Assassination ---\n"
+    "--- MVP Selection ---"
+)
+
+
+@pytest.mark.parametrize(
+    "log",
+    [CHUNKING_LOG, "--- Starting Quest 1 ---\nno trailing newline", "no markers at all\n", ""],
+    ids=["phases", "leading_marker", "no_markers", "empty"],
+)
+def test_split_log_into_chunks_matches_the_lookahead_split(log):
+    assert list(split_log_into_chunks(log)) == [c for c in _BASELINE_SPLIT_RE.split(log) if c]
+
+
+def test_split_log_into_chunks_splits_at_a_mid_line_marker():
+    chunks = list(split_log_into_chunks(CHUNKING_LOG))
+    assert chunks[2].endswith("Player 0 (Merlin) says: fine ")
+    assert chunks[3] == "--- Team Discussion starts mid-line\n"
+
+
+# --- pack_chunks ---
+
+def test_pack_chunks_merges_small_chunks_in_order():
+    chunks = ["a" * 40, "b" * 40, "c" * 40]
+    assert pack_chunks(chunks, budget=1000) == ["".join(chunks)]
+
+
+def test_pack_chunks_respects_budget_and_skips_blank_chunks():
+    chunks = ["a" * 400, "  \n", "b" * 400, "c" * 400]
+    # Each chunk is ~101 estimated tokens, so two fit in a 250-token budget and the third starts a new request.
+    assert pack_chunks(chunks, budget=250) == ["a" * 400 + "b" * 400, "c" * 400]
+
+
+def test_pack_chunks_keeps_an_oversized_chunk_whole():
+    assert pack_chunks(["x" * 4000, "y"], budget=10) == ["x" * 4000, "y"]
+
+
+def test_pack_chunks_empty():
+    assert pack_chunks([]) == []
+
+
+# --- extract_json_text ---
+
+@pytest.mark.parametrize(
+    ("reply", "expected"),
+    [
+        ('```json\n[{"a": 1}]\n```', '[{"a": 1}]'),
+        ('```JSON\n[1]\n```', "[1]"),
+        ("Here you go:\n```\n[2]\n```\nDone.", "[2]"),
+        ('```json\n[{"a": 1}, {"b"', '[{"a": 1}, {"b"'),  # cut off before the closing fence
+        ("  [3]  \n", "[3]"),
+    ],
+    ids=["json_fence", "upper_case_tag", "bare_fence_with_prose", "unterminated_fence", "no_fence"],
+)
+def test_extract_json_text(reply, expected):
+    assert extract_json_text(reply) == expected
+
+
+# --- salvage_json_array ---
+
+def test_salvage_json_array_keeps_complete_elements_of_a_truncated_reply():
+    text = json.dumps([NARRATION, SPEECH])[:-20]
+    assert salvage_json_array(text) == [NARRATION]
+
+
+def test_salvage_json_array_complete_array():
+    assert salvage_json_array(json.dumps([NARRATION, SPEECH], indent=2)) == [NARRATION, SPEECH]
+
+
+@pytest.mark.parametrize("text", ["", "no array here", "[", "[}"])
+def test_salvage_json_array_nothing_to_salvage(text):
+    assert salvage_json_array(text) == []
+
+
+# --- validate_events ---
+
+def test_validate_events_accepts_valid_events():
+    assert validate_events([NARRATION, SPEECH]) == []
+
+
+def test_validate_events_reports_each_problem():
+    events = [
+        "not an object",
+        {"event_type": "NARRATOR_SPEECH", "summary": "s"},
+        {"event_type": "PLAYER_SPEECH", "player_id": "2", "summary": "s", "content": "c"},
+        {"event_type": "TEAM_PROPOSAL", "player_id": True, "summary": "s", "content": "c"},
+    ]
+    assert validate_events(events) == [
+        "event 0: expected an object, got str",
+        "event 1: `content` must be a string",
+        "event 2: PLAYER_SPEECH must have an integer `player_id`",
+        "event 3: TEAM_PROPOSAL must have an integer `player_id`",
+    ]
+
+
+def test_validate_events_rejects_non_array():
+    assert validate_events({"events": []}) == ["expected a JSON array, got dict"]
+
+
+# --- salvaged replies go through validation ---
+
+class FakeModel:
+    def __init__(self, replies):
+        self.replies = list(replies)
+
+    async def generate_content_async(self, prompt):
+        return SimpleNamespace(text=self.replies.pop(0))
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    """Points script_writer at a fake model that returns the given replies, with the on-disk response cache bypassed."""
+    def install(*replies):
+        model = FakeModel(replies)
+        monkeypatch.setattr(script_writer, "get_model", lambda: model)
+        monkeypatch.setattr(script_writer, "load_cached_response", lambda cache_key: None)
+        monkeypatch.setattr(script_writer, "store_cached_response", lambda cache_key, events: None)
+        return model
+    return install
+
+
+def test_salvaged_events_that_fail_validation_are_dropped(fake_gemini):
+    speech_without_player = {k: v for k, v in SPEECH.items() if k != "player_id"}
+    truncated = json.dumps([NARRATION, speech_without_player])[:-1] + ', {"event_type": "NARR'
+    fake_gemini(truncated, "still not JSON")  # the reply, then the unusable repair
+    assert asyncio.run(script_writer.structure_chunk_with_llm("log chunk", "protocol")) == [NARRATION]
+
+
+def test_salvaged_events_are_repaired_when_possible(fake_gemini):
+    speech_without_player = {k: v for k, v in SPEECH.items() if k != "player_id"}
+    truncated = json.dumps([NARRATION, speech_without_player])[:-1] + ', {"event_type": "NARR'
+    fake_gemini(truncated, json.dumps([NARRATION, SPEECH]))
+    assert asyncio.run(script_writer.structure_chunk_with_llm("log chunk", "protocol")) == [NARRATION, SPEECH]
+
+
+# --- ScriptWriter ---
+
+def test_script_writer_streams_a_json_array(tmp_path):
+    output = tmp_path / "script.json"
+    unicode_speech = {**SPEECH, "content": "我赞成。 \"Quoted\"\nand a newline."}
+    writer = script_writer.ScriptWriter(str(output))
+    writer.write_events([NARRATION, SPEECH])
+    writer.write_events([])
+    writer.write_events([unicode_speech])
+    writer.close()
+    assert json.loads(output.read_bytes()) == [NARRATION, SPEECH, unicode_speech]
+    assert writer.event_count == 3
+    assert list(tmp_path.iterdir()) == [output]
+
+
+def test_script_writer_without_events_writes_an_empty_array(tmp_path):
+    output = tmp_path / "script.json"
+    writer = script_writer.ScriptWriter(str(output))
+    writer.close()
+    assert json.loads(output.read_bytes()) == []
+
+
+def test_script_writer_abort_leaves_nothing_behind(tmp_path):
+    writer = script_writer.ScriptWriter(str(tmp_path / "script.json"))
+    writer.write_events([NARRATION])
+    writer.abort()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,132 @@
+"""
+Regression tests for speech_rewriter.find_all_speeches against known game-log fragments.
+The expected blocks are what the original two-pass scan produced for each log.
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+pytest.importorskip("yaml")
+
+from tools.speech_rewriter import find_all_speeches, rewrite_speech_batch
+
+GAME_LOG = """Player 3 is assigned role: Assassin
+--- Starting Quest 1 ---
+--- Team Building Attempt 1 (Leader: Player 2) ---
+Leader 2 initially proposed team: [0, 2]. Reasoning: I trust player 0.
+It's a safe start.
+--- Team Discussion ---
+Player 0 (Merlin) says: I approve of this team!
+Player 1 (Servant) says: Hmm, not sure.
+--- Leader's Final Decision ---
+Leader 2 has finalized the team to: [0, 2]. Reasoning: Nobody objected strongly.
+Vote Results: approved
+Some note. Reasoning: standalone leader thought here.
+--- Team Building Attempt 2 (Leader: Player 4) ---
+Reasoning: another standalone reasoning.
+Player 1 voted for Player 3. Reasoning: Player 3 was quiet.
+--- The Final Assassination ---
+Assassin (Evil) proposes to assassinate Player 0. Reasoning: Player 0 knew too much.
+--- MVP Selection ---
+The MVP is Player 0
+MVP (Merlin) says: Thank you all.
+"""
+
+GAME_LOG_BLOCKS = [
+    ("2", "---"),
+    ("2", "I trust player 0.\nIt's a safe start."),
+    ("0", "I approve of this team!"),
+    ("1", "Hmm, not sure."),
+    ("2", "Nobody objected strongly."),
+    ("4", "---\nReasoning: another standalone reasoning."),
+    ("1", "Player 3 was quiet."),
+    ("3", "Player 0 knew too much."),
+    ("0", "Thank you all."),
+]
+
+# A standalone "Reasoning:" right before an Assassin line must not swallow the Assassin's speech.
+REASONING_BEFORE_ASSASSIN_LOG = (
+    "Vote Results: ok\n"
+    "Reasoning: hmm\n"
+    "Assassin (Evil) proposes to assassinate Player 1. Reasoning: Merlin vibes.\n"
+    "--- end\n"
+)
+
+
+@pytest.mark.parametrize(
+    ("log", "expected"),
+    [
+        (GAME_LOG, GAME_LOG_BLOCKS),
+        (REASONING_BEFORE_ASSASSIN_LOG, [("Assassin", "Merlin vibes.")]),
+        ("", []),
+    ],
+    ids=["game_log", "reasoning_before_assassin", "empty"],
+)
+def test_find_all_speeches_matches_known_logs(log, expected):
+    speeches = find_all_speeches(log)
+    assert [(player_id, text) for player_id, text, _ in speeches] == expected
+    for _, text, (start, end) in speeches:
+        assert log[start:end].strip() == text
+
+
+def test_find_all_speeches_spans_are_ordered_and_disjoint():
+    spans = [span for _, _, span in find_all_speeches(GAME_LOG)]
+    assert spans == sorted(spans)
+    assert all(end <= next_start for (_, end), (next_start, _) in zip(spans, spans[1:]))
+
+
+# --- rewrite_speech_batch fallback ---
+
+BATCH_ITEMS = [
+    ("I approve of this team, it looks safe.", "0", "gpt-4"),
+    ("Hmm, I am not sure about Player 3 at all.", "1", "claude"),
+    ("Player 3 was quiet during the whole quest.", "2", "grok"),
+]
+
+
+class FakeRewriteModel:
+    """Answers the batch prompt with batch_reply (raised if it is an exception) and single prompts by upper-casing the speech."""
+    def __init__(self, batch_reply):
+        self.batch_reply = batch_reply
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.single_calls = 0
+
+    async def generate_content_async(self, prompt):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if "Dialogue 1" in prompt:
+                if isinstance(self.batch_reply, Exception):
+                    raise self.batch_reply
+                return SimpleNamespace(text=self.batch_reply)
+            self.single_calls += 1
+            speech = next(speech for speech, _, _ in BATCH_ITEMS if speech in prompt)
+            return SimpleNamespace(text=speech.upper())
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.mark.parametrize(
+    "batch_reply",
+    [json.dumps(["only one rewrite"]), "not JSON at all", json.dumps({"a": 1}), RuntimeError("429 quota")],
+    ids=["wrong_length", "not_json", "not_an_array", "request_error"],
+)
+def test_rewrite_speech_batch_falls_back_one_speech_at_a_time(batch_reply):
+    model = FakeRewriteModel(batch_reply)
+    results = asyncio.run(rewrite_speech_batch(BATCH_ITEMS, model, use_cache=False))
+    assert results == [speech.upper() for speech, _, _ in BATCH_ITEMS]
+    assert model.single_calls == len(BATCH_ITEMS)
+    # The batch holds one concurrency slot, so its fallbacks must not fan out.
+    assert model.max_in_flight == 1
+
+
+def test_rewrite_speech_batch_uses_a_well_formed_reply():
+    model = FakeRewriteModel(json.dumps([" one ", "two", "three"]))
+    assert asyncio.run(rewrite_speech_batch(BATCH_ITEMS, model, use_cache=False)) == ["one", "two", "three"]
+    assert model.single_calls == 0
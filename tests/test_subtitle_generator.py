@@ -0,0 +1,36 @@
+"""
+Unit tests for subtitle_generator's chunking of Whisper word timings into on-screen subtitle lines.
+Whisper itself is never loaded.
+"""
+
+from tools.subtitle_generator import create_subtitle_chunks
+
+
+def make_word_timings(text: str, word_ms: int = 100):
+    return [{"word": word, "start_ms": i * word_ms, "end_ms": (i + 1) * word_ms} for i, word in enumerate(text.split())]
+
+
+def chunk_texts(text: str, **kwargs):
+    return [chunk["text"] for chunk in create_subtitle_chunks(make_word_timings(text), **kwargs)]
+
+
+def test_create_subtitle_chunks_empty_input():
+    assert create_subtitle_chunks([]) == []
+
+
+def test_create_subtitle_chunks_breaks_after_sentence_end():
+    assert chunk_texts("I trust him. Do you? Yes!") == ["I trust him.", "Do you?", "Yes!"]
+
+
+def test_create_subtitle_chunks_breaks_on_comma_only_after_three_words():
+    assert chunk_texts("Well, I think so, honestly yes") == ["Well, I think so,", "honestly yes"]
+
+
+def test_create_subtitle_chunks_caps_words_per_chunk():
+    assert chunk_texts("one two three four five six seven eight") == ["one two three four five six", "seven eight"]
+    assert chunk_texts("one two three four five", max_words_per_chunk=2) == ["one two", "three four", "five"]
+
+
+def test_create_subtitle_chunks_spans_first_to_last_word():
+    chunks = create_subtitle_chunks(make_word_timings("Merlin is Player 2. Reject the team."))
+    assert [(chunk["start_ms"], chunk["end_ms"]) for chunk in chunks] == [(0, 400), (400, 700)]
@@ -1,14 +1,23 @@
 import os
+import sys
 import json
 import logging
 import asyncio
 import re
+import hashlib
+import shutil
+import random
+from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 from google.cloud import texttospeech
-from mutagen.mp3 import MP3
-import yaml
-from pydub import AudioSegment
-import io
+from google.cloud.texttospeech_v1.services.text_to_speech.transports import TextToSpeechGrpcAsyncIOTransport
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable, DeadlineExceeded, InternalServerError
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tools.event_loop import run_async
+from tools.json_util import json_dumps, json_loads
+from tools.yaml_util import load_layout_config
 
 # --- Initial Setup ---
 load_dotenv()
@@ -21,35 +30,247 @@ else:
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# --- Constants ---
+TTS_CACHE_DIR = "outputs/.tts_cache"
+DEFAULT_VOICE = "en-US-Standard-A"
+# Matches one parenthesized performance note, e.g. "(sighs)". Non-greedy so text between notes survives.
+_PERF_NOTE_RE = re.compile(r'\([^)]*\)')
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "12")) # Max in-flight synthesize_speech calls
+TTS_MAX_ATTEMPTS = 5
+TTS_MAX_BACKOFF_SECONDS = 30
+# Errors worth retrying: quota throttling and transient server-side failures.
+_TTS_RETRYABLE_ERRORS = (ResourceExhausted, ServiceUnavailable, DeadlineExceeded, InternalServerError)
+TTS_CHANNEL_POOL_SIZE = int(os.getenv("TTS_CHANNEL_POOL_SIZE", "4")) # gRPC channels the events are spread across
+TTS_MAX_RECEIVE_BYTES = 30 * 1024 * 1024 # Long narrations come back as one large MP3 message
+# Event types voiced by the acting player; everything else is read by the narrator.
+_PLAYER_ID_EVENTS = frozenset({"PLAYER_SPEECH", "TEAM_PROPOSAL", "CONFIRM_TEAM", "MVP_SPEECH", "player_speech", "team_proposal", "mvp_vote"})
+
+def tts_cache_key(voice_name: str, text: str) -> str:
+    """Returns the content hash identifying a synthesized (voice, text) pair."""
+    return hashlib.blake2b((voice_name + "\0" + text).encode('utf-8'), digest_size=16).hexdigest()
+
+def remove_file(path: str):
+    """Unlinks path if it exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def link_or_copy(src: str, dst: str):
+    """
+    Hardlinks src to dst, falling back to a copy across filesystems or where links are unsupported.
+    dst is unlinked first so an existing file (possibly sharing an inode with the cache) is replaced, never overwritten.
+    """
+    remove_file(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def load_cached_audio(cache_key: str, output_filepath: str) -> Optional[int]:
+    """
+    Links (or copies) a cached MP3 to output_filepath and returns its duration in ms.
+    Returns None on a cache miss.
+    """
+    cached_mp3 = os.path.join(TTS_CACHE_DIR, f"{cache_key}.mp3")
+    cached_meta = os.path.join(TTS_CACHE_DIR, f"{cache_key}.json")
+    try:
+        with open(cached_meta, 'r', encoding='utf-8') as f:
+            duration_ms = int(json.load(f)["duration_ms"])
+        link_or_copy(cached_mp3, output_filepath)
+    except (OSError, ValueError, KeyError):
+        return None
+    return duration_ms
+
+def store_cached_audio(cache_key: str, mp3_filepath: str, duration_ms: int):
+    """Stores a freshly synthesized MP3 in the cache. The sidecar is written last, marking the entry complete."""
+    try:
+        os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+        link_or_copy(mp3_filepath, os.path.join(TTS_CACHE_DIR, f"{cache_key}.mp3"))
+        with open(os.path.join(TTS_CACHE_DIR, f"{cache_key}.json"), 'w', encoding='utf-8') as f:
+            json.dump({"duration_ms": duration_ms}, f)
+    except OSError as e:
+        logging.warning(f"Could not write TTS cache entry {cache_key}: {e}")
+
+def output_meta_path(output_filepath: str) -> str:
+    """Returns the sidecar path recording what an event's MP3 was synthesized from, e.g. event_007.meta."""
+    return os.path.splitext(output_filepath)[0] + ".meta"
+
+def load_output_meta(output_filepath: str, cache_key: str) -> Optional[int]:
+    """
+    Returns the duration in ms of an existing output MP3 if its sidecar says it was
+    synthesized from cache_key. Returns None if the file is missing or stale.
+    """
+    try:
+        with open(output_meta_path(output_filepath), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta["hash"] != cache_key or not os.path.exists(output_filepath):
+            return None
+        return int(meta["duration_ms"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def store_output_meta(output_filepath: str, cache_key: str, duration_ms: int):
+    """Records the hash and duration of a freshly written output MP3."""
+    try:
+        with open(output_meta_path(output_filepath), 'w', encoding='utf-8') as f:
+            json.dump({"hash": cache_key, "duration_ms": duration_ms}, f)
+    except OSError as e:
+        logging.warning(f"Could not write {output_meta_path(output_filepath)}: {e}")
+
+def remove_output_meta(output_filepath: str):
+    """Drops an output's sidecar before the MP3 is rewritten, so a failed write never looks current."""
+    remove_file(output_meta_path(output_filepath))
+
+# MPEG audio Layer III bitrates (kbps) by bitrate index, for MPEG-1 and MPEG-2/2.5.
+_MP3_BITRATES_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_MP3_BITRATES_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+
+def skip_id3v2(data: bytes) -> int:
+    """Returns the offset of the first byte after a leading ID3v2 tag (0 if there is none)."""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+def mp3_duration_ms(data: bytes) -> int:
+    """
+    Computes the duration of a CBR MP3 stream (as returned by Google TTS) from its first
+    frame header: payload bytes * 8 / bitrate. Raises ValueError if no valid frame is found.
+    """
+    end = len(data) - 128 if data[-128:-125] == b'TAG' else len(data) # Ignore a trailing ID3v1 tag
+    pos = data.find(b'\xff', skip_id3v2(data))
+    while 0 <= pos < end - 3:
+        b1, b2 = data[pos + 1], data[pos + 2]
+        version = (b1 >> 3) & 0x3
+        layer = (b1 >> 1) & 0x3
+        bitrate_index = b2 >> 4
+        if (b1 & 0xE0) == 0xE0 and version != 1 and layer == 1 and 0 < bitrate_index < 15 and (b2 >> 2) & 0x3 != 3:
+            bitrates = _MP3_BITRATES_V1 if version == 3 else _MP3_BITRATES_V2
+            return int((end - pos) * 8 / bitrates[bitrate_index])
+        pos = data.find(b'\xff', pos + 1)
+    raise ValueError("No MPEG Layer III frame header found in audio data.")
+
+def concat_mp3_bytes(audio_contents: list[bytes]) -> bytes:
+    """
+    Joins MP3 streams of the same voice by concatenating their MPEG frames. The CBR
+    streams Google TTS returns share one format, so no decode/re-encode is needed;
+    only the per-chunk ID3 tags are dropped.
+    """
+    if len(audio_contents) == 1:
+        return audio_contents[0]
+    frames = []
+    for content in audio_contents:
+        end = len(content) - 128 if content[-128:-125] == b'TAG' else len(content)
+        frames.append(content[skip_id3v2(content):end])
+    return b"".join(frames)
+
+def write_file(path: str, data: bytes):
+    """Writes data to path with a single open/write/close on a raw fd (no buffering layer, no fsync)."""
+    remove_file(path) # path may be a hardlink into the TTS cache; truncating it would corrupt the cached copy
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def voice_language_code(voice_name: str) -> str:
+    """Returns the locale part of a voice name, e.g. 'en-US' for 'en-US-Neural2-J' or 'cmn-CN' for 'cmn-CN-Wavenet-A'."""
+    return "-".join(voice_name.split('-', 2)[:2])
+
+# Preferred split points for long text, best first: sentence ends, then clause breaks.
+_SENTENCE_BREAKS = (b'. ', b'! ', b'? ')
+_CLAUSE_BREAKS = (b', ', b'; ', b': ')
+_ASCII_WHITESPACE = b' \t\n\r\x0b\x0c'
+
+def find_split_point(buf: bytes, start: int, end: int) -> int:
+    """
+    Returns where to cut the UTF-8 buffer between start and end: after the last sentence
+    terminator, else after the last clause break, else at the last space, else at end
+    (backed off so a multi-byte character is never cut in half).
+    """
+    for breaks in (_SENTENCE_BREAKS, _CLAUSE_BREAKS):
+        pos = max(buf.rfind(b, start, end) for b in breaks)
+        if pos > start:
+            return pos + 1 # Keep the punctuation with the preceding chunk
+    last_space = buf.rfind(b' ', start, end)
+    if last_space > start:
+        return last_space
+    while end > start + 1 and (buf[end] & 0xC0) == 0x80: # UTF-8 continuation byte
+        end -= 1
+    return end
+
 def split_text_by_bytes(text: str, limit: int = 4500) -> list[str]:
     """
-    Splits text into chunks that are under the byte limit, splitting at the nearest space.
+    Splits text into chunks that are under the byte limit, preferring sentence
+    and clause boundaries so the seams between synthesized chunks are not audible.
+    The text is encoded once and scanned by byte offset; chunks are decoded on emit.
     """
-    if text.encode('utf-8').__len__() <= limit:
+    buf = text.encode('utf-8')
+    if len(buf) <= limit:
         return [text]
 
     chunks = []
-    while text.encode('utf-8').__len__() > limit:
-        # Find a split point near the limit
-        split_at = limit
-        # Find the last space before the limit
-        last_space = text.rfind(' ', 0, split_at)
-        if last_space != -1:
-            split_at = last_space
-        
-        chunks.append(text[:split_at])
-        text = text[split_at:].lstrip()
-    chunks.append(text)
+    start = 0
+    while len(buf) - start > limit:
+        split_at = find_split_point(buf, start, start + limit)
+        chunks.append(buf[start:split_at].decode('utf-8'))
+        start = split_at
+        while start < len(buf) and buf[start] in _ASCII_WHITESPACE:
+            start += 1
+    chunks.append(buf[start:].decode('utf-8'))
     return chunks
 
 class AudioGenerator:
-    def __init__(self, config_path="data/layout.yaml"):
+    def __init__(self, config_path="data/layout.yaml", force=False):
         print("Initializing Audio Generator...")
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+        self.force = force # Re-synthesize every event, ignoring up-to-date outputs and the TTS cache
+        self.config = load_layout_config(config_path)
         self.voice_mapping = self.config.get("voice_mapping", {})
         if not self.voice_mapping:
             raise ValueError("Voice mapping is missing from the layout configuration.")
+        # Keys may be ints in the YAML; events are looked up by the string form of their player_id.
+        self._voice_by_pid = {str(key): voice_name for key, voice_name in self.voice_mapping.items()}
+        invalid_voices = sorted(v for v in set(self._voice_by_pid.values()) if not isinstance(v, str) or v.count('-') < 2)
+        if invalid_voices:
+            raise ValueError(f"Voice mapping contains voice names without a locale (expected e.g. 'en-US-Neural2-J'): {invalid_voices}")
+        # Voice and audio configs never change during a run, so build them once up front.
+        self._voice_params = {
+            voice_name: texttospeech.VoiceSelectionParams(language_code=voice_language_code(voice_name), name=voice_name)
+            for voice_name in {DEFAULT_VOICE, *self._voice_by_pid.values()}
+        }
+        self._audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
+        # In-flight syntheses by (voice, text), so repeated lines in one run share a single set of RPCs.
+        self._inflight: dict[tuple[str, str], asyncio.Future] = {}
+        # Caps in-flight TTS requests at the quota's sweet spot; only the RPC itself is gated.
+        self._tts_semaphore = asyncio.Semaphore(TTS_CONCURRENCY)
+        # Created lazily and reused, so repeat runs keep warm gRPC channels instead of redoing TLS and auth.
+        # Several channels, because one HTTP/2 connection caps concurrent streams and stalls behind slow ones.
+        self._clients: list[texttospeech.TextToSpeechAsyncClient] = []
+
+    def _get_client(self, index: int = 0) -> texttospeech.TextToSpeechAsyncClient:
+        """Returns a client from the shared channel pool, round-robin by index, creating the pool on first use."""
+        if not self._clients:
+            self._clients = [self._create_client() for _ in range(max(1, TTS_CHANNEL_POOL_SIZE))]
+        return self._clients[index % len(self._clients)]
+
+    @staticmethod
+    def _create_client() -> texttospeech.TextToSpeechAsyncClient:
+        """Creates a TTS client on its own gRPC channel."""
+        # Pin the grpc.aio transport so calls never fall back to a blocking channel on the event loop.
+        channel = TextToSpeechGrpcAsyncIOTransport.create_channel(
+            options=[("grpc.max_receive_message_length", TTS_MAX_RECEIVE_BYTES)]
+        )
+        return texttospeech.TextToSpeechAsyncClient(transport=TextToSpeechGrpcAsyncIOTransport(channel=channel))
+
+    async def close(self):
+        """Closes the gRPC channels of the shared TTS clients."""
+        clients, self._clients = self._clients, []
+        for client in clients:
+            await client.transport.close()
 
     async def _generate_single_audio_chunk(self, text_chunk: str, voice_params: dict, audio_config: dict, client: texttospeech.TextToSpeechAsyncClient) -> bytes:
         """Generates audio for a small text chunk."""
@@ -59,66 +280,114 @@ class AudioGenerator:
             voice=voice_params,
             audio_config=audio_config
         )
-        response = await client.synthesize_speech(request=request)
-        return response.audio_content
+        for attempt in range(TTS_MAX_ATTEMPTS):
+            try:
+                async with self._tts_semaphore:
+                    response = await client.synthesize_speech(request=request)
+                return response.audio_content
+            except _TTS_RETRYABLE_ERRORS as e:
+                if attempt == TTS_MAX_ATTEMPTS - 1:
+                    raise
+                # Jitter keeps calls that failed together from retrying in lockstep.
+                delay = min(2 ** attempt, TTS_MAX_BACKOFF_SECONDS) + random.random()
+                logging.warning(f"TTS call failed ({type(e).__name__}), retrying in {delay:.1f}s (attempt {attempt + 1}/{TTS_MAX_ATTEMPTS}).")
+                await asyncio.sleep(delay)
+
+    async def _synthesize_text(self, clean_text: str, voice_params: dict, audio_config: dict, client: texttospeech.TextToSpeechAsyncClient) -> tuple[bytes, int]:
+        """Synthesizes text of any length and returns the MP3 bytes with their duration in ms."""
+        text_chunks = split_text_by_bytes(clean_text)
+
+        audio_tasks = [self._generate_single_audio_chunk(chunk, voice_params, audio_config, client) for chunk in text_chunks if chunk]
+        audio_contents = await asyncio.gather(*audio_tasks)
 
-    async def generate_audio_for_event(self, event: dict, index: int, client: texttospeech.TextToSpeechAsyncClient, output_dir: str) -> dict:
-        """Generates a single audio file for an event, handling long text by splitting it."""
+        duration_ms = sum(mp3_duration_ms(content) for content in audio_contents)
+        return concat_mp3_bytes(audio_contents), duration_ms
+
+    def _resolve_event(self, event: dict, index: int) -> Optional[tuple]:
+        """Returns (player_id, voice_name, clean_text) for an event that needs audio, or None if it has nothing to voice."""
         event_type = event.get("event_type")
         text_content = event.get("content")
 
         if not text_content:
             return None
 
-        clean_text = re.sub(r'\(.*\)', '', text_content).strip()
+        clean_text = _PERF_NOTE_RE.sub('', text_content).strip()
         if not clean_text:
             return None
 
-        player_id_events = ["PLAYER_SPEECH", "TEAM_PROPOSAL", "CONFIRM_TEAM", "MVP_SPEECH", "player_speech", "team_proposal", "mvp_vote"]
-        
         player_id = event.get("player_id")
-        if event_type in player_id_events:
+        if event_type in _PLAYER_ID_EVENTS:
             if player_id is None:
                 logging.warning(f"Skipping {event_type} event {index} due to missing player_id.")
                 return None
-            voice_name = self.voice_mapping.get(str(player_id), "en-US-Standard-A")
-            logging_name = f"Player {player_id}"
+            voice_key = str(player_id)
         else:
             player_id = "NARRATOR"
-            voice_name = self.voice_mapping.get("NARRATOR", "en-US-Standard-A")
-            logging_name = "Narrator"
+            voice_key = "NARRATOR"
+        return player_id, self._voice_by_pid.get(voice_key, DEFAULT_VOICE), clean_text
 
-        output_filename = f"event_{index:03d}.mp3"
-        output_filepath = os.path.join(output_dir, output_filename)
+    @staticmethod
+    def _event_metadata(index: int, player_id, output_filepath: str, duration_ms: int, clean_text: str) -> dict:
+        return {
+            "event_index": index,
+            "player_id": player_id,
+            "file_path": output_filepath,
+            "duration_ms": duration_ms,
+            "text": clean_text
+        }
 
-        logging.info(f"Generating audio for event {index} ({logging_name}) -> {output_filename}")
+    def _cached_event_audio(self, index: int, player_id, voice_name: str, clean_text: str, output_filepath: str) -> Optional[dict]:
+        """
+        Returns the metadata for an event whose audio is already on disk, either as an up-to-date
+        output file or in the TTS cache (linked into place). Returns None if it must be synthesized.
+        """
+        if self.force:
+            return None
+        cache_key = tts_cache_key(voice_name, clean_text)
+        duration_ms = load_output_meta(output_filepath, cache_key)
+        if duration_ms is not None:
+            logging.info(f"Audio for event {index} is up to date, skipping.")
+            return self._event_metadata(index, player_id, output_filepath, duration_ms, clean_text)
 
-        voice_params = texttospeech.VoiceSelectionParams(language_code=voice_name.split('-')[0] + '-' + voice_name.split('-')[1], name=voice_name)
-        audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
+        remove_output_meta(output_filepath)
+        duration_ms = load_cached_audio(cache_key, output_filepath)
+        if duration_ms is not None:
+            logging.info(f"TTS cache hit for event {index}, skipping synthesis.")
+            store_output_meta(output_filepath, cache_key, duration_ms)
+            return self._event_metadata(index, player_id, output_filepath, duration_ms, clean_text)
+        return None
+
+    async def _synthesize_event(self, index: int, player_id, voice_name: str, clean_text: str, output_filepath: str,
+                                client: texttospeech.TextToSpeechAsyncClient) -> Optional[dict]:
+        """Synthesizes an event's audio (sharing any identical in-flight request), writes it and fills the caches."""
+        logging_name = "Narrator" if player_id == "NARRATOR" else f"Player {player_id}"
+        logging.info(f"Generating audio for event {index} ({logging_name}) -> {os.path.basename(output_filepath)}")
+
+        voice_params = self._voice_params[voice_name]
+        audio_config = self._audio_config
 
         try:
-            text_chunks = split_text_by_bytes(clean_text)
-            
-            combined_audio = AudioSegment.empty()
-            
-            audio_tasks = [self._generate_single_audio_chunk(chunk, voice_params, audio_config, client) for chunk in text_chunks if chunk]
-            audio_contents = await asyncio.gather(*audio_tasks)
-            
-            for content in audio_contents:
-                combined_audio += AudioSegment.from_file(io.BytesIO(content), format="mp3")
+            cache_key = tts_cache_key(voice_name, clean_text)
+            remove_output_meta(output_filepath)
 
-            combined_audio.export(output_filepath, format="mp3")
+            inflight_key = (voice_name, clean_text)
+            synthesis = self._inflight.get(inflight_key)
+            is_owner = synthesis is None
+            if is_owner:
+                synthesis = asyncio.ensure_future(self._synthesize_text(clean_text, voice_params, audio_config, client))
+                self._inflight[inflight_key] = synthesis
+                synthesis.add_done_callback(lambda _: self._inflight.pop(inflight_key, None))
+            else:
+                logging.info(f"Event {index} repeats an in-flight line, reusing its synthesis.")
+            audio_content, duration_ms = await synthesis
 
-            audio = MP3(output_filepath)
-            duration_ms = int(audio.info.length * 1000)
+            # MP3 bytes go to disk on a worker thread so slow or network storage never stalls the event loop.
+            await asyncio.to_thread(write_file, output_filepath, audio_content)
+            if is_owner:
+                await asyncio.to_thread(store_cached_audio, cache_key, output_filepath, duration_ms)
+            store_output_meta(output_filepath, cache_key, duration_ms)
 
-            return {
-                "event_index": index,
-                "player_id": player_id,
-                "file_path": output_filepath,
-                "duration_ms": duration_ms,
-                "text": clean_text
-            }
+            return self._event_metadata(index, player_id, output_filepath, duration_ms, clean_text)
         except Exception as e:
             logging.error(f"Failed to generate audio for event {index}. Error: {e}")
             return None
@@ -128,29 +397,41 @@ class AudioGenerator:
         logging.info(f"Starting audio generation from script: {script_file}")
 
         try:
-            with open(script_file, 'r', encoding='utf-8') as f:
-                final_script = json.load(f)
+            final_script = json_loads(await asyncio.to_thread(Path(script_file).read_bytes))
         except FileNotFoundError:
             logging.error(f"Final script file not found: {script_file}")
             return
+        except json.JSONDecodeError as e: # orjson.JSONDecodeError subclasses this
+            logging.error(f"Final script file is not valid JSON: {script_file}. Error: {e}")
+            return
 
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
             logging.info(f"Created output directory: {output_dir}")
 
-        client = texttospeech.TextToSpeechAsyncClient()
-        
-        tasks = [
-            self.generate_audio_for_event(event, i, client, output_dir)
-            for i, event in enumerate(final_script)
-        ]
-        
-        results = await asyncio.gather(*tasks)
+        # Settle cached events in one synchronous pass, so coroutines and RPCs are only created for real misses.
+        results = [None] * len(final_script)
+        misses = []
+        for i, event in enumerate(final_script):
+            resolved = self._resolve_event(event, i)
+            if resolved is None:
+                continue
+            output_filepath = os.path.join(output_dir, f"event_{i:03d}.mp3")
+            results[i] = self._cached_event_audio(i, *resolved, output_filepath)
+            if results[i] is None:
+                misses.append((i, resolved, output_filepath))
+        logging.info(f"{len(misses)} events need synthesis; the rest are cached or have nothing to voice.")
+
+        synthesized = await asyncio.gather(*(
+            self._synthesize_event(i, *resolved, output_filepath, self._get_client(i))
+            for i, resolved, output_filepath in misses
+        ))
+        for (i, _, _), res in zip(misses, synthesized):
+            results[i] = res
         
         audio_metadata = [res for res in results if res is not None]
         
-        with open(metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(audio_metadata, f, indent=2)
+        await asyncio.to_thread(Path(metadata_file).write_bytes, json_dumps(audio_metadata, indent=True))
             
         logging.info(f"Audio generation complete. Metadata saved to: {metadata_file}")
         logging.info(f"Generated {len(audio_metadata)} audio files in '{output_dir}'.")
@@ -163,15 +444,18 @@ if __name__ == "__main__":
     parser.add_argument("script_file", help="Path to the input JSON script file.")
     parser.add_argument("output_dir", help="Directory to save the generated audio files.", default="generated_audio")
     parser.add_argument("metadata_file", help="Path for the output audio metadata JSON file.")
+    parser.add_argument("--force", action="store_true", help="Re-synthesize every event, even if its audio is up to date.")
     args = parser.parse_args()
 
     if not os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
         print("\nERROR: GOOGLE_APPLICATION_CREDENTIALS environment variable is not set.")
     else:
-        try:
-            import pydub
-        except ImportError:
-            print("pydub is not installed. Please run: pip install pydub")
-        else:
-            audio_gen = AudioGenerator()
-            asyncio.run(audio_gen.generate_all_audio(args.script_file, args.output_dir, args.metadata_file))
\ No newline at end of file
+        audio_gen = AudioGenerator(force=args.force)
+
+        async def run():
+            try:
+                await audio_gen.generate_all_audio(args.script_file, args.output_dir, args.metadata_file)
+            finally:
+                await audio_gen.close()
+
+        run_async(run())
\ No newline at end of file
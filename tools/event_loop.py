@@ -0,0 +1,17 @@
+"""
+Event loop setup shared by the asyncio command-line tools
+(audio_generator.py, script_writer.py, speech_rewriter.py).
+"""
+import asyncio
+
+def run_async(main):
+    """
+    Runs a coroutine to completion on uvloop when it is installed (libuv: cheaper scheduling for the
+    fan-out of network calls), otherwise on the stock asyncio loop, and returns its result.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.run(main)
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+        return runner.run(main)
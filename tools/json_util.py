@@ -0,0 +1,46 @@
+"""
+JSON helpers shared by the tools: orjson when it is installed, else the stdlib json module,
+with the same output either way (UTF-8 bytes, non-ASCII kept as-is).
+"""
+import os
+import sys
+import json
+import mmap
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_loads(data):
+    """Parses JSON text or bytes with orjson when available, else the stdlib json module."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def json_dumps(obj, indent: bool = False) -> bytes:
+    """Serializes obj to UTF-8 JSON bytes (non-ASCII kept as-is), 2-space indented if indent is set."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
+
+def load_json_file(path: str):
+    """
+    Parses a JSON file straight from a read-only memory map with orjson.
+    Falls back to the stdlib json module when orjson is unavailable or on Windows.
+    """
+    if orjson is None or sys.platform == "win32":
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    fd = os.open(path, os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0))
+    try:
+        if os.fstat(fd).st_size == 0:
+            # mmap refuses empty files; let orjson raise the usual decode error.
+            return orjson.loads(b"")
+        with mmap.mmap(fd, 0, prot=mmap.PROT_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return orjson.loads(view)
+            finally:
+                view.release()
+    finally:
+        os.close(fd)
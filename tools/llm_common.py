@@ -0,0 +1,53 @@
+"""
+Helpers shared by the Gemini-backed tools (script_writer.py, speech_rewriter.py):
+request pacing, reply parsing and the on-disk response cache.
+"""
+import os
+import re
+import asyncio
+import hashlib
+
+LLM_CACHE_DIR = "outputs/.llm_cache"
+# A fenced code block, with or without a (any-case) json tag; the model sometimes wraps its JSON in one.
+# A reply cut off before the closing fence still yields everything after the opening one.
+JSON_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*(?:```|\Z)", re.DOTALL | re.IGNORECASE)
+
+class RateLimiter:
+    """Spaces request starts evenly so no more than `rate` begin per `period` seconds."""
+    def __init__(self, rate: float, period: float = 60.0):
+        self._interval = period / rate
+        self._next_start = 0.0
+
+    async def acquire(self):
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next_start)
+        self._next_start = start + self._interval # Claimed before awaiting, so concurrent callers queue up in order
+        if start > now:
+            await asyncio.sleep(start - now)
+
+def response_text(response) -> str:
+    """Returns a Gemini reply's text. response.text raises ValueError when the reply has no single text candidate, so fall back to joining the parts."""
+    try:
+        return response.text
+    except ValueError:
+        return "".join(part.text for part in response.parts)
+
+def extract_json_text(text: str) -> str:
+    """Returns the contents of the first fenced code block in an LLM reply, or the whole reply if it has none."""
+    match = JSON_FENCE_RE.search(text)
+    return match.group(1) if match else text.strip()
+
+def llm_cache_key(*parts: str) -> str:
+    """
+    Hashes everything that determines a reply (prompt version, model name, prompt) into a cache key,
+    so a model switch or prompt revision never serves a stale entry.
+    """
+    return hashlib.sha256("\0".join(parts).encode('utf-8')).hexdigest()
+
+def write_file_atomic(path: str, data: bytes):
+    """Writes data to a temp file next to path and renames it into place, so readers never see a partial file. Raises OSError."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
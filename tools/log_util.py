@@ -0,0 +1,31 @@
+"""
+Logging setup shared by the Gemini-backed tools (script_writer.py, speech_rewriter.py).
+"""
+import os
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# The debug log file is opt-in (AITHEATER_DEBUG=1).
+DEBUG_ENABLED = os.getenv("AITHEATER_DEBUG") == "1"
+debug_formatter = logging.Formatter('%(asctime)s - %(levelname)s - [%(name)s] - %(message)s')
+
+def setup_debug_logger(name: str, log_file: str) -> logging.Logger:
+    """
+    Returns the named debug logger. With AITHEATER_DEBUG=1 it records everything to log_file; records go
+    through a queue so the file writes happen on a listener thread, not on the event loop. Otherwise it
+    only passes on warnings and errors.
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG if DEBUG_ENABLED else logging.WARNING)
+    logger.propagate = False
+    if DEBUG_ENABLED and not logger.handlers:
+        file_handler = logging.FileHandler(log_file, mode='w')
+        file_handler.setFormatter(debug_formatter)
+        records = queue.SimpleQueue()
+        logger.addHandler(QueueHandler(records))
+        listener = QueueListener(records, file_handler)
+        listener.start()
+        atexit.register(listener.stop)
+    return logger
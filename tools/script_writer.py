@@ -1,16 +1,25 @@
 import os
 import json
+import random
 import logging
 import google.generativeai as genai
 import re
 import asyncio
 import sys
 import argparse
-from typing import List, Dict, Any
+from datetime import timedelta
+from pathlib import Path
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tools.llm_common import LLM_CACHE_DIR, RateLimiter, extract_json_text, llm_cache_key, response_text, write_file_atomic
+from tools.event_loop import run_async
+from tools.json_util import json_dumps, json_loads
+from tools.log_util import setup_debug_logger
 
 # --- Logging Setup ---
 plain_formatter = logging.Formatter('%(message)s')
-debug_formatter = logging.Formatter('%(asctime)s - %(levelname)s - [%(name)s] - %(message)s')
 script_logger = logging.getLogger("script_flow")
 script_logger.setLevel(logging.INFO)
 script_logger.propagate = False
@@ -18,20 +27,174 @@ if not script_logger.handlers:
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(plain_formatter)
     script_logger.addHandler(console_handler)
-debug_logger = logging.getLogger("debug")
-debug_logger.setLevel(logging.DEBUG)
-debug_logger.propagate = False
-if not debug_logger.handlers:
-    debug_file_handler = logging.FileHandler('script_writer_debug.log', mode='w')
-    debug_file_handler.setFormatter(debug_formatter)
-    debug_logger.addHandler(debug_file_handler)
+debug_logger = setup_debug_logger("debug", "script_writer_debug.log")
 # --- End Logging Setup ---
 
-async def structure_chunk_with_llm(chunk: str, protocol: str, model: genai.GenerativeModel) -> List[Dict[str, Any]]:
+STRUCTURE_MODEL = os.getenv("GEMINI_MODEL_STRUCTURE", "models/gemini-2.5-flash") # Model for the structuring pass, e.g. models/gemini-2.5-flash-lite
+PROMPT_VERSION = "v2" # Bump when the structuring prompt or its post-processing changes, to invalidate the LLM cache
+PROMPT_CACHE_TTL = timedelta(minutes=10) # Server-side lifetime of the cached protocol prefix, extended while chunks are still going out
+PROMPT_CACHE_REFRESH_MARGIN = 120.0 # Seconds before expiry at which the next request first extends the TTL
+STRUCTURE_MAX_ATTEMPTS = 3
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "4")) # Max chunks being structured at once
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "6000")) # Target input tokens per structuring request
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "0")) # Requests per minute allowed by the account's quota; 0 = unlimited
+# Markers that open a new game phase; the log is chunked ahead of each one.
+_PHASE_MARKERS = ("--- Starting Quest", "--- Team Building Attempt", "--- Team Discussion", "--- Leader's Final Decision", "--- The Final Assassination", "--- MVP Selection ---")
+# Unanchored, like the original lookahead split: a marker starts a new chunk even in the middle of a line.
+_PHASE_HEADER_RE = re.compile("|".join(map(re.escape, _PHASE_MARKERS)))
+# Core fields every event must carry, and the event types that must name their player (see prompts/script_protocol.md).
+_REQUIRED_EVENT_FIELDS = ("event_type", "summary", "content")
+_PLAYER_EVENT_TYPES = frozenset({"PLAYER_SPEECH", "TEAM_PROPOSAL", "LEADER_DECISION"})
+
+def split_log_into_chunks(game_log: str) -> Iterator[str]:
     """
-    Uses LLM to structure a chunk based on the provided, explicit protocol.
+    Yields the game log split ahead of each phase marker, keeping the marker with the chunk it starts.
+    Boundaries come from one scan of a compiled pattern and match the old re.split lookahead (minus its
+    empty leading chunk); each chunk is sliced out only when it is consumed.
+    """
+    start = 0
+    for match in _PHASE_HEADER_RE.finditer(game_log):
+        if match.start() > start:
+            yield game_log[start:match.start()]
+            start = match.start()
+    if start < len(game_log):
+        yield game_log[start:]
+
+def pack_chunks(chunks: Iterable[str], budget: int = CHUNK_TOKEN_BUDGET) -> List[str]:
+    """
+    Greedily merges adjacent non-empty chunks up to about `budget` tokens, so short phases (a vote,
+    a decision) share one request and one copy of the prompt prefix. Tokens are estimated at
+    4 characters each, which avoids a count_tokens round-trip per chunk.
+    """
+    packed = []
+    current = []
+    current_tokens = 0
+    for chunk in chunks:
+        if not chunk.strip():
+            continue
+        tokens = len(chunk) // 4 + 1
+        if current and current_tokens + tokens > budget:
+            packed.append("".join(current))
+            current = []
+            current_tokens = 0
+        current.append(chunk)
+        current_tokens += tokens
+    if current:
+        packed.append("".join(current))
+    return packed
+
+def salvage_json_array(text: str) -> List[Dict[str, Any]]:
+    """
+    Decodes a malformed JSON array element by element and returns the elements
+    before the first one that fails to parse (e.g. a reply truncated mid-object).
+    """
+    start = text.find('[')
+    if start == -1:
+        return []
+    decoder = json.JSONDecoder()
+    events = []
+    pos = start + 1
+    while True:
+        while pos < len(text) and text[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(text) or text[pos] == ']':
+            return events
+        try:
+            event, pos = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            return events
+        events.append(event)
+
+def _event_errors(i: int, event: Any) -> List[str]:
+    """Checks one event (number i in its array) against the protocol's core schema. Returns one message per problem."""
+    if not isinstance(event, dict):
+        return [f"event {i}: expected an object, got {type(event).__name__}"]
+    errors = []
+    for field in _REQUIRED_EVENT_FIELDS:
+        if not isinstance(event.get(field), str):
+            errors.append(f"event {i}: `{field}` must be a string")
+    event_type = event.get("event_type")
+    if event_type in _PLAYER_EVENT_TYPES and type(event.get("player_id")) is not int:
+        errors.append(f"event {i}: {event_type} must have an integer `player_id`")
+    return errors
+
+def validate_events(events: Any) -> List[str]:
+    """Checks structured events against the protocol's core schema. Returns one message per problem; empty means valid."""
+    if not isinstance(events, list):
+        return [f"expected a JSON array, got {type(events).__name__}"]
+    return [error for i, event in enumerate(events) for error in _event_errors(i, event)]
+
+async def repair_events(events: Any, errors: List[str], rate_limiter: Optional[RateLimiter] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Asks the model to fix only the listed schema problems in an otherwise parsed reply.
+    Returns the corrected events, or None if the repaired reply is still unusable.
+    """
+    problems = "\n".join(f"- {e}" for e in errors)
+    prompt = f"""The JSON below breaks these rules of the scripting protocol:
+{problems}
+
+Fix only those fields and keep every other value, including all `content` text, exactly as it is.
+Produce only the corrected JSON array.
+
+{json_dumps(events).decode('utf-8')}"""
+    if rate_limiter is not None:
+        await rate_limiter.acquire()
+    response = await get_model().generate_content_async(prompt)
+    try:
+        repaired = json_loads(extract_json_text(response_text(response)))
+    except ValueError:
+        return None
+    return None if validate_events(repaired) else repaired
+
+def load_cached_response(cache_key: str) -> Optional[List[Dict[str, Any]]]:
+    """Returns the structured events cached for a prompt hash, or None on a miss."""
+    try:
+        with open(os.path.join(LLM_CACHE_DIR, f"{cache_key}.json"), 'rb') as f:
+            return json_loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+def store_cached_response(cache_key: str, events: List[Dict[str, Any]]):
+    """Caches structured events for a prompt hash."""
+    try:
+        write_file_atomic(os.path.join(LLM_CACHE_DIR, f"{cache_key}.json"), json_dumps(events))
+    except OSError as e:
+        debug_logger.warning(f"Could not write LLM cache entry {cache_key}: {e}")
+
+class ScriptWriter:
+    """
+    Streams the final script to disk as an indented UTF-8 JSON array, one chunk's events at a time, so the
+    whole script never has to be held in memory. Written to a temp file and renamed into place on close.
     """
-    prompt = f"""
+    def __init__(self, output_file_path: str):
+        self._path = output_file_path
+        self._tmp_path = f"{output_file_path}.{os.getpid()}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self.event_count = 0
+
+    def write_events(self, events: List[Dict[str, Any]]):
+        for event in events:
+            self._file.write(b"[\n  " if self.event_count == 0 else b",\n  ")
+            # Nest the event's own indented form one level deeper; JSON strings never contain a raw newline.
+            self._file.write(json_dumps(event, indent=True).replace(b"\n", b"\n  "))
+            self.event_count += 1
+
+    def close(self):
+        self._file.write(b"\n]" if self.event_count else b"[]")
+        self._file.close()
+        os.replace(self._tmp_path, self._path)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._tmp_path)
+
+@lru_cache(maxsize=4)
+def _structure_prompt_parts(protocol: str) -> Tuple[str, str]:
+    """
+    Builds the structuring prompt around the chunk once per protocol; only the chunk varies between calls,
+    so each call just concatenates prefix + chunk + suffix.
+    """
+    prefix = f"""
 You are a data transformation AI. Your only job is to convert the following raw text log chunk into a structured JSON array based on the provided protocol.
 
 **JSON SCRIPTING PROTOCOL:**
@@ -46,30 +209,153 @@ You are a data transformation AI. Your only job is to convert the following raw
 
 **GAME LOG CHUNK TO STRUCTURE:**
 ---
-{chunk}
+""".lstrip()
+    suffix = """
 ---
 
 **OUTPUT:**
-Produce only the validated JSON array.
-""".strip()
+Produce only the JSON array.
+"""
+    return prefix, suffix.rstrip()
+
+_MODEL: Optional[genai.GenerativeModel] = None
+
+def get_model() -> genai.GenerativeModel:
+    """Returns the process-wide structuring model, created on first use so repeated runs share its client."""
+    global _MODEL
+    if _MODEL is None:
+        _MODEL = genai.GenerativeModel(STRUCTURE_MODEL)
+    return _MODEL
 
+def create_prompt_cache(prefix: str) -> Optional[genai.caching.CachedContent]:
+    """
+    Uploads the fixed prompt prefix (instructions + protocol) as Gemini cached content, so each chunk
+    request only sends its own text. Returns None when caching is unavailable, e.g. the prefix is below
+    the model's minimum cacheable size.
+    """
     try:
-        response = await model.generate_content_async(prompt)
-        script_text = "".join(part.text for part in response.parts)
-        if script_text.strip().startswith("```json"):
-            script_text = script_text.strip()[7:-3].strip()
-        return json.loads(script_text)
+        return genai.caching.CachedContent.create(model=STRUCTURE_MODEL, contents=[prefix], ttl=PROMPT_CACHE_TTL)
     except Exception as e:
-        debug_logger.error(f"Failed to STRUCTURE chunk: {chunk[:100]}... Error: {e}")
-        return []
+        script_logger.info(f"Gemini context cache unavailable, sending the full prompt with each chunk. ({e})")
+        return None
+
+class PromptCache:
+    """
+    The structuring prompt prefix held as Gemini cached content for one run. It is only created when the
+    first chunk misses the local LLM cache, so a fully cached rerun never pays for it, and its TTL is
+    extended whenever a request goes out close to expiry, so a long rate-limited run never hits an
+    expired cache. Falls back to the plain model (full prompt per request) when caching is unavailable.
+    """
+    def __init__(self, prefix: str):
+        self._prefix = prefix
+        self._lock = asyncio.Lock()
+        self._cache: Optional[genai.caching.CachedContent] = None
+        self._model: Optional[genai.GenerativeModel] = None
+        self._expires_at = 0.0
+        self._unavailable = False
+
+    async def model(self) -> Tuple[genai.GenerativeModel, bool]:
+        """Returns (model, prefix_cached); with prefix_cached set, the model already holds the prompt prefix."""
+        async with self._lock:
+            if self._unavailable:
+                return get_model(), False
+            now = asyncio.get_running_loop().time()
+            if self._cache is None:
+                self._cache = await asyncio.to_thread(create_prompt_cache, self._prefix)
+                if self._cache is None:
+                    self._unavailable = True
+                    return get_model(), False
+                self._model = genai.GenerativeModel.from_cached_content(self._cache)
+                self._expires_at = now + PROMPT_CACHE_TTL.total_seconds()
+            elif self._expires_at - now < PROMPT_CACHE_REFRESH_MARGIN:
+                try:
+                    await asyncio.to_thread(self._cache.update, ttl=PROMPT_CACHE_TTL)
+                    self._expires_at = now + PROMPT_CACHE_TTL.total_seconds()
+                except Exception as e:
+                    script_logger.info(f"Could not extend the Gemini context cache, sending the full prompt from now on. ({e})")
+                    self._unavailable = True
+                    return get_model(), False
+            return self._model, True
+
+    async def delete(self):
+        """Deletes the cached content if it was created. Best effort: it expires on its own anyway."""
+        if self._cache is None:
+            return
+        try:
+            await asyncio.to_thread(self._cache.delete)
+        except Exception as e:
+            script_logger.warning(f"Could not delete the Gemini context cache (it will expire on its own): {e}")
+        self._cache = None
+
+async def structure_chunk_with_llm(chunk: str, protocol: str, prompt_cache: Optional[PromptCache] = None,
+                                   rate_limiter: Optional[RateLimiter] = None) -> List[Dict[str, Any]]:
+    """
+    Uses LLM to structure a chunk based on the provided, explicit protocol.
+    With a prompt_cache, requests go through the cached prompt prefix when it is available, so only the rest is sent.
+    Every request, retries included, first waits for a slot from rate_limiter when one is given.
+    """
+    prefix, suffix = _structure_prompt_parts(protocol)
+    prompt = prefix + chunk + suffix
+
+    # Re-running the same log (the usual development loop) reuses earlier responses instead of calling Gemini again.
+    cache_key = llm_cache_key(PROMPT_VERSION, STRUCTURE_MODEL, prompt)
+    cached_events = load_cached_response(cache_key)
+    if cached_events is not None:
+        return cached_events
+
+    for attempt in range(STRUCTURE_MAX_ATTEMPTS):
+        try:
+            if rate_limiter is not None:
+                await rate_limiter.acquire()
+            # Fetched after the rate-limit wait, so any TTL extension happens right before the request that needs it.
+            if prompt_cache is not None:
+                model, prefix_cached = await prompt_cache.model()
+            else:
+                model, prefix_cached = get_model(), False
+            response = await model.generate_content_async(chunk + suffix if prefix_cached else prompt)
+            script_text = extract_json_text(response_text(response))
+            try:
+                events = json_loads(script_text)
+            except ValueError:
+                events = salvage_json_array(script_text)
+                if not events:
+                    raise
+                # Keep what parsed rather than losing the whole chunk; partial results are not cached.
+                debug_logger.warning(f"Salvaged {len(events)} events from malformed JSON for chunk: {chunk[:100]}...")
+                errors = validate_events(events)
+                if errors:
+                    repaired = await repair_events(events, errors, rate_limiter)
+                    if repaired is None:
+                        # Drop the events the repair could not fix instead of writing them into the script.
+                        repaired = [event for i, event in enumerate(events) if not _event_errors(i, event)]
+                        debug_logger.warning(f"Dropped {len(events) - len(repaired)} salvaged events that failed validation: {errors[:3]}")
+                        if not repaired:
+                            raise ValueError(f"no salvaged event passed validation: {errors[:3]}")
+                    events = repaired
+                return events
+            # Checked locally rather than asking the model to review its own output; only a failing reply costs another call.
+            errors = validate_events(events)
+            if errors:
+                debug_logger.warning(f"Structured chunk failed validation ({len(errors)} problems), requesting a repair: {errors[:3]}")
+                events = await repair_events(events, errors, rate_limiter)
+                if events is None:
+                    raise ValueError(f"structured output failed validation: {errors[:3]}")
+            store_cached_response(cache_key, events)
+            return events
+        except Exception as e:
+            debug_logger.error(f"Failed to STRUCTURE chunk (attempt {attempt + 1}/{STRUCTURE_MAX_ATTEMPTS}): {chunk[:100]}... Error: {e}")
+            if attempt < STRUCTURE_MAX_ATTEMPTS - 1:
+                await asyncio.sleep(2 ** attempt + random.random()) # Jitter so throttled chunks don't retry in lockstep
+    return []
 
 async def create_script_from_log(log_file_path: str, output_file_path: str, protocol_path: str):
     script_logger.info(f"Starting script generation from log file: {log_file_path}")
     try:
-        with open(log_file_path, 'r', encoding='utf-8') as f:
-            game_log = f.read()
-        with open(protocol_path, 'r', encoding='utf-8') as f:
-            protocol = f.read()
+        # Read both inputs on worker threads, concurrently, without blocking the event loop.
+        game_log, protocol = await asyncio.gather(
+            asyncio.to_thread(Path(log_file_path).read_text, encoding='utf-8'),
+            asyncio.to_thread(Path(protocol_path).read_text, encoding='utf-8'),
+        )
     except FileNotFoundError as e:
         script_logger.error(f"File not found: {e.filename}")
         return
@@ -79,31 +365,47 @@ async def create_script_from_log(log_file_path: str, output_file_path: str, prot
         script_logger.error("GEMINI_API_KEY environment variable not set.")
         return
     genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('models/gemini-2.5-flash')
 
-    delimiters = r"(?=--- Starting Quest|--- Team Building Attempt|--- Team Discussion|--- Leader's Final Decision|--- The Final Assassination|--- MVP Selection ---)"
-    chunks = re.split(delimiters, game_log)
-    
-    final_script = []
-    script_logger.info(f"Log split into {len(chunks)} chunks for processing.")
+    chunks = pack_chunks(split_log_into_chunks(game_log))
 
-    for i, chunk in enumerate(chunks):
-        if not chunk.strip():
-            continue
-        
-        script_logger.info(f"--- Processing Chunk {i+1}/{len(chunks)} ---")
-        
-        structured_events = await structure_chunk_with_llm(chunk, protocol, model)
-        
-        if not structured_events:
-            continue
-        
-        final_script.extend(structured_events)
+    script_logger.info(f"Log split into {len(chunks)} chunks for processing (phases packed up to ~{CHUNK_TOKEN_BUDGET} tokens each).")
+
+    prompt_cache = PromptCache(_structure_prompt_parts(protocol)[0])
+    writer = await asyncio.to_thread(ScriptWriter, output_file_path)
+    try:
+        try:
+            # Chunks are independent, so structure several at once; the semaphore and RPM limiter keep us under Gemini's rate limits.
+            semaphore = asyncio.Semaphore(GEMINI_CONCURRENCY)
+            rate_limiter = RateLimiter(GEMINI_RPM) if GEMINI_RPM > 0 else None
+
+            async def process_chunk(i: int, chunk: str) -> Tuple[int, List[Dict[str, Any]]]:
+                async with semaphore:
+                    script_logger.info(f"--- Processing Chunk {i+1}/{len(chunks)} ---")
+                    return i, await structure_chunk_with_llm(chunk, protocol, prompt_cache, rate_limiter=rate_limiter)
 
-    script_logger.info(f"Successfully processed all chunks. Total events: {len(final_script)}")
+            # Handle chunks as they finish (so progress is visible while stragglers run), slotting each
+            # result in by index. Every completed run of chunks at the front is written out and dropped,
+            # so events stay in log order and only chunks that finished early are ever buffered.
+            results: List[Optional[List[Dict[str, Any]]]] = [None] * len(chunks)
+            next_to_write = 0
+            pending = [process_chunk(i, chunk) for i, chunk in enumerate(chunks)]
+            for done, finished in enumerate(asyncio.as_completed(pending), start=1):
+                i, structured_events = await finished
+                results[i] = structured_events
+                script_logger.info(f"Chunk {i+1} structured into {len(structured_events)} events ({done}/{len(chunks)} done).")
+                while next_to_write < len(chunks) and results[next_to_write] is not None:
+                    await asyncio.to_thread(writer.write_events, results[next_to_write])
+                    results[next_to_write] = None
+                    next_to_write += 1
+        except BaseException:
+            writer.abort() # Leave no partial script behind
+            raise
+        # The script is complete; put it in place before the optional remote cleanup below.
+        await asyncio.to_thread(writer.close)
+    finally:
+        await prompt_cache.delete()
 
-    with open(output_file_path, 'w', encoding='utf-8') as f:
-        json.dump(final_script, f, indent=2, ensure_ascii=False)
+    script_logger.info(f"Successfully processed all chunks. Total events: {writer.event_count}")
     script_logger.info(f"Successfully generated and saved the final script to: {output_file_path}")
 
 if __name__ == "__main__":
@@ -112,4 +414,4 @@ if __name__ == "__main__":
     parser.add_argument("output_file", help="Path for the output JSON script file.")
     parser.add_argument("--protocol", default="prompts/script_protocol.md", help="Path to the script protocol definition file.")
     args = parser.parse_args()
-    asyncio.run(create_script_from_log(args.log_file, args.output_file, args.protocol))
+    run_async(create_script_from_log(args.log_file, args.output_file, args.protocol))
@@ -1,16 +1,32 @@
 import os
-import yaml
+import json
 import logging
 import google.generativeai as genai
 import re
+import bisect
+import random
 import asyncio
 import sys
 import argparse
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tools.llm_common import LLM_CACHE_DIR, RateLimiter, extract_json_text, llm_cache_key, response_text, write_file_atomic
+from tools.event_loop import run_async
+from tools.yaml_util import load_yaml
+from tools.log_util import setup_debug_logger
+
+REWRITE_MODEL = os.getenv("GEMINI_MODEL_REWRITE", "models/gemini-1.5-pro-latest") # Model for the rewrite pass, e.g. models/gemini-2.5-flash
+REWRITE_PROMPT_VERSION = "v1" # Bump when the rewrite prompt or its post-processing changes, to invalidate cached rewrites
+REWRITE_CONCURRENCY = int(os.getenv("REWRITE_CONCURRENCY", "8")) # Max rewrite requests in flight at once
+REWRITE_RPM = float(os.getenv("REWRITE_RPM", "60")) # Max rewrite requests started per minute; 0 = unlimited (script_writer.py paces itself with GEMINI_RPM)
+REWRITE_MAX_ATTEMPTS = 3
+REWRITE_MAX_BACKOFF_SECONDS = 30
+REWRITE_BATCH_SIZE = int(os.getenv("REWRITE_BATCH_SIZE", "8")) # Speeches packed into one rewrite request
+REWRITE_MIN_WORDS = int(os.getenv("REWRITE_MIN_WORDS", "4")) # Shorter speeches ("OK.", "Yes, approve.") are kept as-is
 
 # --- Logging Setup ---
 plain_formatter = logging.Formatter('%(message)s')
-debug_formatter = logging.Formatter('%(asctime)s - %(levelname)s - [%(name)s] - %(message)s')
 
 rewrite_logger = logging.getLogger("rewrite_flow")
 rewrite_logger.setLevel(logging.INFO)
@@ -20,20 +36,66 @@ if not rewrite_logger.handlers:
     console_handler.setFormatter(plain_formatter)
     rewrite_logger.addHandler(console_handler)
 
-debug_logger = logging.getLogger("rewrite_debug")
-debug_logger.setLevel(logging.DEBUG)
-debug_logger.propagate = False
-if not debug_logger.handlers:
-    debug_file_handler = logging.FileHandler('speech_rewriter_debug.log', mode='w')
-    debug_file_handler.setFormatter(debug_formatter)
-    debug_logger.addHandler(debug_file_handler)
+debug_logger = setup_debug_logger("rewrite_debug", "speech_rewriter_debug.log")
 # --- End Logging Setup ---
 
+# Speech blocks, compiled once at import. The alternation captures multiple patterns:
+# 1. Player X (Role) says: ...
+# 2. Leader X ... Reasoning: ...
+# 3. Reasoning: ... (following a leader statement)
+# 4. MVP/Assassin ... Reasoning: ...
+# It captures the player ID from various contexts.
+_SPEECH_RE = re.compile(
+    r"(?:Player (\d+) \([\w\s]+\) says: |Leader (\d+) initially proposed team:.*?Reasoning: |Leader (\d+) has finalized the team to:.*?Reasoning: |\(Leader: Player (\d+)\)|Player (\d+) voted for Player \d+\. Reasoning: |(Assassin) \(\w+\) proposes to assassinate Player \d+\. Reasoning: |(MVP) \([\w\s]+\) says: )"
+    r"([\s\S]*?)"
+    r"(?=\n(?:---|\Z|Player \d+|Leader \d+|Vote Results|Quest Execution|Assassin|MVP))"
+)
+# Standalone "Reasoning:" blocks the speech pattern can miss; attributed to the preceding leader.
+_REASONING_RE = re.compile(r"Reasoning: ([\s\S]*?)(?=\n(?:---|\Z|Player \d+|Leader \d+))")
+_LEADER_RE = re.compile(r"\(Leader: Player (\d+)\)")
+_ASSASSIN_ID_RE = re.compile(r"Player (\d+) is assigned role: Assassin")
+_MVP_ID_RE = re.compile(r"The MVP is Player (\d+)")
+_REAL_WORD_RE = re.compile(r"[A-Za-z]{3,}")
+
+# Rules shared by the single-speech and batched rewrite prompts.
+_REWRITE_RULES = """
+1.  **DO NOT** change the core meaning, strategic intent, or key information. The rewritten speech must convey the exact same facts and arguments.
+2.  **Inject Personality:** Make it sound like an AI with a distinct personality. For example, Grok might be bombastic, GPT might be corporate but polished, Claude might be philosophical, and Deepseek might sound like an older, respected model.
+3.  **Add In-Jokes:** Weave in subtle (or not-so-subtle) jokes about the AI world.
+    - *Example Joke:* A Deepseek model might say to a GPT model, "Careful, I was running circles around your ancestors."
+    - *Example Joke:* A Grok model might say something arrogant like, "My logic is undeniable, unlike some other models I could mention."
+4.  **Make it Conversational:** Use contractions (I'm, don't), break up long sentences, and make it flow well when spoken aloud.
+""".strip()
+
+_MODEL: Optional[genai.GenerativeModel] = None
+
+def get_model() -> genai.GenerativeModel:
+    """Returns the process-wide rewrite model, created on first use so repeated runs share its client."""
+    global _MODEL
+    if _MODEL is None:
+        _MODEL = genai.GenerativeModel(REWRITE_MODEL)
+    return _MODEL
+
+def load_cached_rewrite(cache_key: str) -> Optional[str]:
+    """Returns the rewritten speech cached for a prompt hash, or None on a miss."""
+    try:
+        with open(os.path.join(LLM_CACHE_DIR, f"{cache_key}.txt"), 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def store_cached_rewrite(cache_key: str, text: str):
+    """Caches a rewritten speech for a prompt hash."""
+    try:
+        write_file_atomic(os.path.join(LLM_CACHE_DIR, f"{cache_key}.txt"), text.encode('utf-8'))
+    except OSError as e:
+        debug_logger.warning(f"Could not write rewrite cache entry {cache_key}: {e}")
+
 def load_player_identities(config_path: str) -> Dict[str, str]:
     """Loads player ID to model name mapping from the config file."""
     try:
         with open(config_path, 'r') as f:
-            config = yaml.safe_load(f)
+            config = load_yaml(f)
         
         player_map = {
             str(p['player_id']): p['model'] 
@@ -45,11 +107,9 @@ def load_player_identities(config_path: str) -> Dict[str, str]:
         rewrite_logger.error(f"Could not read or parse config.yaml: {e}")
         return {}
 
-async def rewrite_speech(speech: str, player_id: str, model_identity: str, model: genai.GenerativeModel) -> str:
-    """
-    [LLM Call] Rewrites dialogue to be more conversational and model-aware.
-    """
-    prompt = f"""
+def _rewrite_prompt(speech: str, player_id: str, model_identity: str) -> str:
+    """Builds the prompt that rewrites one speech."""
+    return f"""
 You are a master script doctor for a show where AI models play the game of Avalon.
 Your task is to rewrite the following dialogue, spoken by a specific AI model, to be more conversational, engaging, and natural-sounding.
 
@@ -58,12 +118,7 @@ Your task is to rewrite the following dialogue, spoken by a specific AI model, t
 - **Your Goal:** Inject personality, humor, and "in-jokes" related to the speaker's AI identity. The tone should be witty and self-aware.
 
 **CRITICAL RULES:**
-1.  **DO NOT** change the core meaning, strategic intent, or key information. The rewritten speech must convey the exact same facts and arguments.
-2.  **Inject Personality:** Make it sound like an AI with a distinct personality. For example, Grok might be bombastic, GPT might be corporate but polished, Claude might be philosophical, and Deepseek might sound like an older, respected model.
-3.  **Add In-Jokes:** Weave in subtle (or not-so-subtle) jokes about the AI world.
-    - *Example Joke:* A Deepseek model might say to a GPT model, "Careful, I was running circles around your ancestors."
-    - *Example Joke:* A Grok model might say something arrogant like, "My logic is undeniable, unlike some other models I could mention."
-4.  **Make it Conversational:** Use contractions (I'm, don't), break up long sentences, and make it flow well when spoken aloud.
+{_REWRITE_RULES}
 5.  **Output ONLY the rewritten text.** Do not add explanations or quote marks.
 
 **DIALOGUE TO REWRITE:**
@@ -74,62 +129,143 @@ Your task is to rewrite the following dialogue, spoken by a specific AI model, t
 
 **Your Rewritten, Model-Aware Dialogue:**
 """.strip()
-    debug_logger.debug(f"REQUEST for Speech Rewrite:\n{prompt}")
-    try:
-        response = await model.generate_content_async(prompt)
-        rewritten_text = "".join(part.text for part in response.parts).strip()
-        debug_logger.debug(f"RAW RESPONSE from Rewrite: {rewritten_text}")
-        
-        if rewritten_text.startswith('"') and rewritten_text.endswith('"'):
-            rewritten_text = rewritten_text[1:-1]
-            
-        return rewritten_text
-    except Exception as e:
-        debug_logger.error(f"Failed to REWRITE speech for Player {player_id}: {speech[:100]}... Error: {e}")
-        return speech # Return original speech on failure
+
+def _rewrite_cache_key(prompt: str) -> str:
+    return llm_cache_key(REWRITE_PROMPT_VERSION, REWRITE_MODEL, prompt)
+
+def _batch_rewrite_prompt(items: List[Tuple[str, str, str]]) -> str:
+    """Builds the prompt that rewrites several speeches at once and asks for a JSON array back."""
+    dialogues = "\n---\n".join(
+        f'**Dialogue {n} (from Player {player_id}, the "{model_identity}"):**\n"{speech}"'
+        for n, (speech, player_id, model_identity) in enumerate(items, 1)
+    )
+    return f"""
+You are a master script doctor for a show where AI models play the game of Avalon.
+Your task is to rewrite each of the following {len(items)} dialogues, each spoken by a specific AI model, to be more conversational, engaging, and natural-sounding.
+
+**CONTEXT:**
+- **Speakers' AI Identities:** Given with each dialogue below.
+- **Your Goal:** Inject personality, humor, and "in-jokes" related to each speaker's AI identity. The tone should be witty and self-aware.
+
+**CRITICAL RULES:**
+{_REWRITE_RULES}
+5.  **Output ONLY a JSON array of {len(items)} strings:** the rewritten dialogues, in the same order. Do not add explanations.
+
+**DIALOGUES TO REWRITE:**
+---
+{dialogues}
+---
+
+**Your Rewritten, Model-Aware Dialogues (JSON array):**
+""".strip()
+
+async def rewrite_speech(speech: str, player_id: str, model_identity: str, model: genai.GenerativeModel,
+                         rate_limiter: Optional[RateLimiter] = None, use_cache: bool = True) -> str:
+    """
+    [LLM Call] Rewrites dialogue to be more conversational and model-aware.
+    Failed calls (e.g. 429s) are retried with jittered exponential backoff; every attempt first waits
+    for a slot from rate_limiter when one is given. Successful rewrites are cached on disk unless use_cache is off.
+    """
+    prompt = _rewrite_prompt(speech, player_id, model_identity)
+    cache_key = _rewrite_cache_key(prompt)
+    if use_cache:
+        cached_text = load_cached_rewrite(cache_key)
+        if cached_text is not None:
+            return cached_text
+
+    # Lazy %-args: the multi-KB prompt is only formatted when a DEBUG handler will actually emit it.
+    if debug_logger.isEnabledFor(logging.DEBUG):
+        debug_logger.debug("REQUEST for Speech Rewrite:\n%s", prompt)
+    for attempt in range(REWRITE_MAX_ATTEMPTS):
+        try:
+            if rate_limiter is not None:
+                await rate_limiter.acquire()
+            response = await model.generate_content_async(prompt)
+            rewritten_text = response_text(response).strip()
+            debug_logger.debug("RAW RESPONSE from Rewrite: %s", rewritten_text)
+
+            if rewritten_text.startswith('"') and rewritten_text.endswith('"'):
+                rewritten_text = rewritten_text[1:-1]
+
+            if use_cache:
+                store_cached_rewrite(cache_key, rewritten_text)
+            return rewritten_text
+        except Exception as e:
+            debug_logger.error(f"Failed to REWRITE speech for Player {player_id} (attempt {attempt + 1}/{REWRITE_MAX_ATTEMPTS}): {speech[:100]}... Error: {e}")
+            if attempt < REWRITE_MAX_ATTEMPTS - 1:
+                await asyncio.sleep(min(2 ** attempt + random.random(), REWRITE_MAX_BACKOFF_SECONDS)) # Jitter so throttled calls don't retry in lockstep
+    return speech # Return original speech on failure
+
+async def rewrite_speech_batch(items: List[Tuple[str, str, str]], model: genai.GenerativeModel,
+                               rate_limiter: Optional[RateLimiter] = None, use_cache: bool = True) -> List[str]:
+    """
+    [LLM Call] Rewrites several (speech, player_id, model_identity) items with one request, returning the
+    rewrites in item order. Items are cached individually, so only the misses are sent. If the reply is
+    not a JSON array with one string per item, the items fall back to their own rewrite_speech calls, one after another.
+    """
+    cache_keys = [_rewrite_cache_key(_rewrite_prompt(*item)) for item in items]
+    results: List[Optional[str]] = [load_cached_rewrite(key) if use_cache else None for key in cache_keys]
+    pending = [i for i, text in enumerate(results) if text is None]
+    if len(pending) > 1:
+        prompt = _batch_rewrite_prompt([items[i] for i in pending])
+        try:
+            if rate_limiter is not None:
+                await rate_limiter.acquire()
+            response = await model.generate_content_async(prompt)
+            rewritten = json.loads(extract_json_text(response_text(response)))
+            if isinstance(rewritten, list) and len(rewritten) == len(pending) and all(isinstance(t, str) for t in rewritten):
+                for i, text in zip(pending, rewritten):
+                    results[i] = text.strip()
+                    if use_cache:
+                        store_cached_rewrite(cache_keys[i], results[i])
+                pending = []
+            else:
+                debug_logger.warning(f"Batch rewrite returned a malformed array for {len(pending)} speeches; rewriting them one by one.")
+        except Exception as e:
+            debug_logger.error(f"Failed to REWRITE batch of {len(pending)} speeches, rewriting them one by one. Error: {e}")
+    # One request at a time: the caller holds a single REWRITE_CONCURRENCY slot for the whole batch.
+    for i in pending:
+        results[i] = await rewrite_speech(*items[i], model, rate_limiter, use_cache)
+    return results
+
+def is_worth_rewriting(speech: str) -> bool:
+    """False for speeches too short or too bare (punctuation, numbers, team lists) for a rewrite to add anything."""
+    return len(speech.split()) >= REWRITE_MIN_WORDS and _REAL_WORD_RE.search(speech) is not None
 
 def find_all_speeches(log_content: str) -> List[Tuple[str, str, Tuple[int, int]]]:
     """
     Finds all speeches, statements, and reasonings in the log file.
     Returns a list of tuples: (player_id, text_to_rewrite, (start_index, end_index))
     """
-    # This regex now captures multiple patterns:
-    # 1. Player X (Role) says: ...
-    # 2. Leader X ... Reasoning: ...
-    # 3. Reasoning: ... (following a leader statement)
-    # 4. MVP/Assassin ... Reasoning: ...
-    # It captures the player ID from various contexts.
-    pattern = re.compile(
-        r"(?:Player (\d+) \([\w\s]+\) says: |Leader (\d+) initially proposed team:.*?Reasoning: |Leader (\d+) has finalized the team to:.*?Reasoning: |\(Leader: Player (\d+)\)|Player (\d+) voted for Player \d+\. Reasoning: |(Assassin) \(\w+\) proposes to assassinate Player \d+\. Reasoning: |(MVP) \([\w\s]+\) says: )"
-        r"([\s\S]*?)"
-        r"(?=\n(?:---|\Z|Player \d+|Leader \d+|Vote Results|Quest Execution|Assassin|MVP))"
-    )
-    
     matches = []
     last_leader_id = None
 
+    # The Assassin and MVP are resolved from whole-log lookups; do each scan once, not once per matching block.
+    assassin_id_search = _ASSASSIN_ID_RE.search(log_content)
+    assassin_id = assassin_id_search.group(1) if assassin_id_search else None
+    mvp_id_search = _MVP_ID_RE.search(log_content)
+    mvp_id = mvp_id_search.group(1) if mvp_id_search else None
+
     # Find explicit leader IDs first to handle standalone "Reasoning:" blocks
-    leader_ids = {m.start(): m.group(1) for m in re.finditer(r"\(Leader: Player (\d+)\)", log_content)}
+    leader_ids = {m.start(): m.group(1) for m in _LEADER_RE.finditer(log_content)}
+    leader_positions = list(leader_ids) # Ascending, as finditer yields them; bisected for the closest preceding leader
     
     # Find all speech blocks
-    for match in pattern.finditer(log_content):
+    for match in _SPEECH_RE.finditer(log_content):
         groups = match.groups()
         player_id = next((g for g in groups[:7] if g is not None), None)
         speech_text = groups[7].strip()
         
         # Handle special cases for Assassin/MVP
         if player_id == "Assassin":
-            assassin_id_search = re.search(r"Player (\d+) is assigned role: Assassin", log_content)
-            if assassin_id_search: player_id = assassin_id_search.group(1)
+            if assassin_id: player_id = assassin_id
         elif player_id == "MVP":
-            mvp_id_search = re.search(r"The MVP is Player (\d+)", log_content)
-            if mvp_id_search: player_id = mvp_id_search.group(1)
+            if mvp_id: player_id = mvp_id
 
         # Find the closest preceding leader ID for context
-        current_pos = match.start()
-        closest_leader_pos = max([pos for pos in leader_ids if pos < current_pos], default=-1)
-        if closest_leader_pos != -1:
-            last_leader_id = leader_ids[closest_leader_pos]
+        idx = bisect.bisect_left(leader_positions, match.start()) - 1
+        if idx >= 0:
+            last_leader_id = leader_ids[leader_positions[idx]]
 
         if player_id is None:
             player_id = last_leader_id
@@ -140,16 +276,18 @@ def find_all_speeches(log_content: str) -> List[Tuple[str, str, Tuple[int, int]]
             speech_end = match.end(8)
             matches.append((player_id, speech_text, (speech_start, speech_end)))
 
-    # A second pass for simple "Reasoning:" blocks that might be missed
-    reasoning_pattern = re.compile(r"Reasoning: ([\s\S]*?)(?=\n(?:---|\Z|Player \d+|Leader \d+))")
-    for match in reasoning_pattern.finditer(log_content):
+    # A second pass for simple "Reasoning:" blocks that might be missed.
+    # First-pass spans are ascending and disjoint, so the only one that can contain a position is the last one starting at or before it.
+    captured_starts = [m[2][0] for m in matches]
+    captured_ends = [m[2][1] for m in matches]
+    for match in _REASONING_RE.finditer(log_content):
         # Check if this block is already captured
-        is_captured = any(m[2][0] <= match.start(1) <= m[2][1] for m in matches)
+        span_idx = bisect.bisect_right(captured_starts, match.start(1)) - 1
+        is_captured = span_idx >= 0 and match.start(1) <= captured_ends[span_idx]
         if not is_captured:
-            current_pos = match.start()
-            closest_leader_pos = max([pos for pos in leader_ids if pos < current_pos], default=-1)
-            if closest_leader_pos != -1:
-                player_id = leader_ids[closest_leader_pos]
+            idx = bisect.bisect_left(leader_positions, match.start()) - 1
+            if idx >= 0:
+                player_id = leader_ids[leader_positions[idx]]
                 text = match.group(1).strip()
                 if text:
                      matches.append((player_id, text, match.span(1)))
@@ -159,9 +297,10 @@ def find_all_speeches(log_content: str) -> List[Tuple[str, str, Tuple[int, int]]
     return matches
 
 
-async def rewrite_speeches_in_log(input_log_path: str, output_log_path: str, config_path: str):
+async def rewrite_speeches_in_log(input_log_path: str, output_log_path: str, config_path: str, use_cache: bool = True):
     """
     Reads a game log, rewrites all player speeches with model-aware personality, and saves to a new file.
+    With use_cache off, every speech is sent to Gemini again and the rewrite cache is left untouched.
     """
     rewrite_logger.info(f"Starting model-aware speech rewriting for log file: {input_log_path}")
     
@@ -182,7 +321,7 @@ async def rewrite_speeches_in_log(input_log_path: str, output_log_path: str, con
         rewrite_logger.error("GEMINI_API_KEY environment variable not set.")
         return
     genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('models/gemini-1.5-pro-latest')
+    model = get_model()
 
     speech_matches = find_all_speeches(game_log)
     
@@ -190,26 +329,47 @@ async def rewrite_speeches_in_log(input_log_path: str, output_log_path: str, con
         rewrite_logger.warning("No speeches found in the log file. Please check the regex pattern.")
         return
 
-    rewrite_logger.info(f"Found {len(speech_matches)} speeches/reasonings to rewrite. Processing with Gemini 1.5 Pro...")
+    rewrite_logger.info(f"Found {len(speech_matches)} speeches/reasonings to rewrite. Processing with {REWRITE_MODEL}...")
+
+    # Bounded fan-out: at most REWRITE_CONCURRENCY requests in flight, started no faster than REWRITE_RPM allows.
+    semaphore = asyncio.Semaphore(REWRITE_CONCURRENCY)
+    rate_limiter = RateLimiter(REWRITE_RPM) if REWRITE_RPM > 0 else None
 
-    tasks = []
-    for player_id, speech_text, _ in speech_matches:
-        if player_id in player_identities:
-            model_identity = player_identities[player_id]
-            tasks.append(rewrite_speech(speech_text, player_id, model_identity, model))
-        else:
-            tasks.append(asyncio.sleep(0, result=speech_text)) # Keep original if no identity
+    async def throttled_rewrite(batch: List[Tuple[str, str, str]]) -> List[str]:
+        async with semaphore:
+            return await rewrite_speech_batch(batch, model, rate_limiter, use_cache)
 
-    rewritten_speeches = await asyncio.gather(*tasks)
+    # Speeches without a known identity, or too short to be worth a call, keep their original text;
+    # the rest go out REWRITE_BATCH_SIZE per request.
+    rewritten_speeches = [speech_text for _, speech_text, _ in speech_matches]
+    to_rewrite = [i for i, (player_id, speech_text, _) in enumerate(speech_matches)
+                  if player_id in player_identities and is_worth_rewriting(speech_text)]
+    skipped = len(speech_matches) - len(to_rewrite)
+    if skipped:
+        rewrite_logger.info(f"Keeping {skipped}/{len(speech_matches)} speeches unchanged (no identity, or too short to rewrite).")
+    batches = [to_rewrite[n:n + REWRITE_BATCH_SIZE] for n in range(0, len(to_rewrite), REWRITE_BATCH_SIZE)]
+    batch_results = await asyncio.gather(*(
+        throttled_rewrite([(speech_matches[i][1], speech_matches[i][0], player_identities[speech_matches[i][0]]) for i in batch])
+        for batch in batches
+    ))
+    for batch, results in zip(batches, batch_results):
+        for i, text in zip(batch, results):
+            rewritten_speeches[i] = text
 
     rewrite_logger.info("All speeches have been rewritten. Replacing them in the log...")
 
-    # Replace from the end to the beginning to not mess up indices
-    modified_log = game_log
-    for i in range(len(speech_matches) - 1, -1, -1):
-        _, _, (start, end) = speech_matches[i]
-        new_speech = rewritten_speeches[i]
-        modified_log = modified_log[:start] + new_speech + modified_log[end:]
+    # One forward pass over the spans (sorted by start): copy the untouched text between them and
+    # splice in each rewrite, then join once, instead of rebuilding the whole log per speech.
+    parts = []
+    cursor = 0
+    for (_, _, (start, end)), new_speech in zip(speech_matches, rewritten_speeches):
+        if start < cursor:
+            continue # Overlaps a span already replaced
+        parts.append(game_log[cursor:start])
+        parts.append(new_speech)
+        cursor = end
+    parts.append(game_log[cursor:])
+    modified_log = "".join(parts)
 
     with open(output_log_path, 'w', encoding='utf-8') as f:
         f.write(modified_log)
@@ -221,6 +381,7 @@ if __name__ == "__main__":
     parser.add_argument("input_file", help="Path to the input game log file.")
     parser.add_argument("output_file", help="Path for the output rewritten log file.")
     parser.add_argument("--config", default="config.yaml", help="Path to the config file with player identities.")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached rewrites and call Gemini for every speech.")
     args = parser.parse_args()
 
     try:
@@ -229,4 +390,4 @@ if __name__ == "__main__":
         print("PyYAML is not installed. Please install it using: pip install PyYAML")
         sys.exit(1)
 
-    asyncio.run(rewrite_speeches_in_log(args.input_file, args.output_file, args.config))
\ No newline at end of file
+    run_async(rewrite_speeches_in_log(args.input_file, args.output_file, args.config, use_cache=not args.no_cache))
\ No newline at end of file
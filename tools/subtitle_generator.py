@@ -1,27 +1,61 @@
-import json
+import importlib.util
 import logging
 import os
+import re
+import sys
 import time
-from typing import List, Dict, Any
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tools.json_util import json_dumps, json_loads
 
 # --- Constants ---
 SUBTITLE_CACHE_DIR = "outputs/subtitles"
 CACHE_FILE = os.path.join(SUBTITLE_CACHE_DIR, "cache.json")
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL", "medium") # e.g. WHISPER_MODEL=small for faster, rougher timings
+# Clips transcribed at once. On the CPU each worker is a process with its own copy of the Whisper model
+# (roughly 1.5-2 GB of RAM for "medium"), so raise this only when memory allows.
+SUBTITLE_WORKERS = int(os.getenv("SUBTITLE_WORKERS", "1"))
+WHISPER_BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "5")) # faster-whisper's default; 1 (greedy) is faster and usually enough since the script text is passed as the prompt
+_END_PUNCT_RE = re.compile(r"[.!?]") # Sentence-ending punctuation closes a subtitle chunk
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # --- Faster-Whisper Model Management ---
 WHISPER_MODEL = None
+_WHISPER_MODEL_LOCK = threading.Lock()
+
+def select_whisper_device() -> Tuple[str, str]:
+    """Returns (device, compute_type): int8 weights with fp16 compute on a CUDA GPU when CTranslate2 sees one, else int8 on CPU."""
+    try:
+        import ctranslate2 # Installed with faster-whisper
+        if ctranslate2.get_cuda_device_count() > 0:
+            return "cuda", "int8_float16"
+    except Exception:
+        pass
+    return "cpu", "int8"
 
-def load_whisper_model(model_size: str = "medium"):
-    """Loads the faster-whisper model into a global variable to avoid reloading."""
+def load_whisper_model(model_size: str = WHISPER_MODEL_SIZE, num_workers: int = SUBTITLE_WORKERS, cpu_threads: int = 0):
+    """
+    Loads the faster-whisper model into a global variable to avoid reloading.
+    Safe to call from several threads; the model is only ever loaded once per process.
+    num_workers is how many transcribe calls the model may run in parallel (one per calling thread);
+    cpu_threads caps the threads each call uses on CPU (0 = CTranslate2's default).
+    """
     global WHISPER_MODEL
-    if WHISPER_MODEL is None:
+    if WHISPER_MODEL is not None:
+        return
+    with _WHISPER_MODEL_LOCK:
+        if WHISPER_MODEL is not None:
+            return
         try:
             from faster_whisper import WhisperModel
-            logging.info(f"Loading faster-whisper model ('{model_size}')... This may take a moment.")
-            WHISPER_MODEL = WhisperModel(model_size, device="cpu", compute_type="int8")
+            device, compute_type = select_whisper_device()
+            logging.info(f"Loading faster-whisper model ('{model_size}', {device}/{compute_type})... This may take a moment.")
+            WHISPER_MODEL = WhisperModel(model_size, device=device, compute_type=compute_type, num_workers=num_workers, cpu_threads=cpu_threads)
             logging.info("Faster-whisper model loaded successfully.")
         except ImportError:
             logging.error("faster-whisper is not installed. Please run: pip install faster-whisper")
@@ -43,7 +77,8 @@ def get_word_level_timestamps_whisper(audio_path: str, text: str) -> List[Dict[s
             audio_path,
             language="en",
             word_timestamps=True,
-            initial_prompt=text
+            initial_prompt=text,
+            beam_size=WHISPER_BEAM_SIZE
         )
         
         word_timings = []
@@ -64,34 +99,33 @@ def get_word_level_timestamps_whisper(audio_path: str, text: str) -> List[Dict[s
 def create_subtitle_chunks(word_timings: List[Dict[str, Any]], max_words_per_chunk: int = 6) -> List[Dict[str, Any]]:
     """Group words into subtitle chunks for better readability."""
     if not word_timings: return []
-    chunks, current_chunk_words = [], []
-    chunk_start_ms = word_timings[0]["start_ms"]
-    for i, word_timing in enumerate(word_timings):
-        current_chunk_words.append(word_timing["word"])
-        is_punctuation_break = any(p in word_timing["word"] for p in '.!?')
-        is_comma_break = ',' in word_timing["word"] and len(current_chunk_words) >= 3
-        is_max_words_reached = len(current_chunk_words) >= max_words_per_chunk
-        is_last_word = i == len(word_timings) - 1
-        
-        if is_punctuation_break or is_comma_break or is_max_words_reached or is_last_word:
-            chunk_text = " ".join(current_chunk_words).strip()
+    words = [word_timing["word"] for word_timing in word_timings]
+    # Per-word break flags come from one pre-pass; the loop below only tracks where the current chunk
+    # started and slices each chunk's words out when it closes.
+    is_end_punct = [_END_PUNCT_RE.search(word) is not None for word in words]
+    has_comma = [',' in word for word in words]
+    chunks = []
+    chunk_start = 0
+    last_index = len(words) - 1
+    for i in range(len(words)):
+        chunk_length = i - chunk_start + 1
+        if is_end_punct[i] or (has_comma[i] and chunk_length >= 3) or chunk_length >= max_words_per_chunk or i == last_index:
+            chunk_text = " ".join(words[chunk_start:i + 1]).strip()
             if chunk_text:
                 chunks.append({
                     "text": chunk_text,
-                    "start_ms": chunk_start_ms,
-                    "end_ms": word_timing["end_ms"]
+                    "start_ms": word_timings[chunk_start]["start_ms"],
+                    "end_ms": word_timings[i]["end_ms"]
                 })
-            current_chunk_words = []
-            if not is_last_word:
-                chunk_start_ms = word_timings[i + 1]["start_ms"]
+            chunk_start = i + 1
     return chunks
 
 # --- Main Process Flow ---
 
-def process_single_audio_file(item: Dict[str, Any], cache: Dict) -> bool:
+def needs_subtitle(item: Dict[str, Any], cache: Dict) -> bool:
     """
-    Processes a single audio file, generating its individual subtitle file.
-    Returns True if a new subtitle file was generated, False if skipped due to cache.
+    Returns True if the event's audio is usable and its subtitle file is missing or stale,
+    False if it must be skipped (missing data or file) or is already up to date per the cache.
     """
     audio_path = item.get("file_path", "")
     event_index = item.get("event_index")
@@ -114,9 +148,26 @@ def process_single_audio_file(item: Dict[str, Any], cache: Dict) -> bool:
             return False
     except OSError:
         logging.warning(f"Could not read metadata for {audio_path}. Forcing re-processing.")
+    return True
+
+def generate_subtitle_file(item: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Transcribes one event's audio and writes its individual subtitle file, without checking the cache first.
+    Returns the (audio_path, cache entry) to record, or None if the result should not be cached. Takes and
+    returns only plain data, so it can run in a worker process.
+    """
+    audio_path = item["file_path"]
+    event_index = item.get("event_index")
+    text = str(item.get("text", "")).strip()
+    duration_ms = int(item.get("duration_ms", 0))
+    individual_subtitle_path = os.path.join(SUBTITLE_CACHE_DIR, f"event_{event_index:03d}.json")
 
     logging.info(f"Cache miss for event {event_index}. Processing...")
     
+    if WHISPER_MODEL is None or WHISPER_MODEL == "UNAVAILABLE":
+        logging.error(f"Whisper model is not available. Leaving event {event_index} for the next run.")
+        return None
+
     word_timings = get_word_level_timestamps_whisper(audio_path, text)
     
     if not word_timings:
@@ -141,15 +192,17 @@ def process_single_audio_file(item: Dict[str, Any], cache: Dict) -> bool:
                 "end_ms": chunk["end_ms"],
                 "text": chunk["text"],
                 "word_count": len(chunk["text"].split()),
-                "source": "faster-whisper-medium"
+                "source": f"faster-whisper-{WHISPER_MODEL_SIZE}"
             })
 
-    with open(individual_subtitle_path, 'w', encoding='utf-8') as f:
-        json.dump(subtitle_chunks, f, indent=2, ensure_ascii=False)
+    with open(individual_subtitle_path, 'wb') as f:
+        f.write(json_dumps(subtitle_chunks, indent=True))
         
-    # Update cache
-    cache[audio_path] = {'mtime': mtime, 'size': size}
-    return True
+    # Cache entry for the caller to record
+    try:
+        return audio_path, {'mtime': os.path.getmtime(audio_path), 'size': os.path.getsize(audio_path)}
+    except OSError:
+        return None # Left uncached, so the next run processes it again
 
 def assemble_final_subtitles(audio_metadata: List[Dict[str, Any]], final_subtitle_file: str):
     """
@@ -166,15 +219,15 @@ def assemble_final_subtitles(audio_metadata: List[Dict[str, Any]], final_subtitl
 
         if os.path.exists(individual_subtitle_path):
             try:
-                with open(individual_subtitle_path, 'r', encoding='utf-8') as f:
-                    individual_subtitles = json.load(f)
+                with open(individual_subtitle_path, 'rb') as f:
+                    individual_subtitles = json_loads(f.read())
                 
                 for sub in individual_subtitles:
                     # Adjust timestamps to be absolute
                     sub["start_ms"] += current_time_ms
                     sub["end_ms"] += current_time_ms
                     all_subtitles.append(sub)
-            except (json.JSONDecodeError, IOError) as e:
+            except (ValueError, IOError) as e:
                 logging.error(f"Could not read or parse individual subtitle for event {event_index}: {e}")
         else:
             logging.warning(f"Individual subtitle file not found for event {event_index}. It will be missing from the final output.")
@@ -182,8 +235,8 @@ def assemble_final_subtitles(audio_metadata: List[Dict[str, Any]], final_subtitl
         current_time_ms += duration_ms
 
     logging.info(f"Generated {len(all_subtitles)} final subtitle entries.")
-    with open(final_subtitle_file, 'w', encoding='utf-8') as f:
-        json.dump(all_subtitles, f, indent=2, ensure_ascii=False)
+    with open(final_subtitle_file, 'wb') as f:
+        f.write(json_dumps(all_subtitles, indent=True))
     logging.info(f"Precise subtitles successfully saved to: {final_subtitle_file}")
 
 def main(metadata_file: str, subtitle_file: str):
@@ -191,30 +244,58 @@ def main(metadata_file: str, subtitle_file: str):
     os.makedirs(SUBTITLE_CACHE_DIR, exist_ok=True)
 
     try:
-        with open(metadata_file, 'r', encoding='utf-8') as f:
-            audio_metadata = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
+        with open(metadata_file, 'rb') as f:
+            audio_metadata = json_loads(f.read())
+    except (FileNotFoundError, ValueError) as e:
         logging.error(f"Failed to read or parse metadata file: {e}")
         return
 
     try:
-        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-            cache = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+        with open(CACHE_FILE, 'rb') as f:
+            cache = json_loads(f.read())
+    except (FileNotFoundError, ValueError):
         cache = {}
 
-    load_whisper_model()
-    if WHISPER_MODEL == "UNAVAILABLE":
-        return
-
     # --- Generation Phase ---
-    for item in audio_metadata:
-        process_single_audio_file(item, cache)
+    try:
+        # Decide what needs transcribing first, so a run with nothing new to do never imports or loads Whisper.
+        pending = [item for item in audio_metadata if needs_subtitle(item, cache)]
+        if pending:
+            if importlib.util.find_spec("faster_whisper") is None:
+                logging.error("faster-whisper is not installed. Please run: pip install faster-whisper")
+                return
+
+            # Clips are independent; transcribe several at once. Each worker only writes its own subtitle
+            # file and hands back its cache entry, which is recorded here.
+            device, _ = select_whisper_device()
+            if device == "cuda":
+                # On the GPU, threads share one model: CTranslate2 releases the GIL and runs their calls concurrently.
+                load_whisper_model()
+                if WHISPER_MODEL == "UNAVAILABLE":
+                    return
+                executor = ThreadPoolExecutor(max_workers=SUBTITLE_WORKERS)
+            else:
+                # On the CPU, transcription is compute-bound; worker processes sidestep the GIL, each loading its own model once.
+                # The cores are split between them so N processes x their compute threads never oversubscribe the CPU.
+                cpu_threads = max(1, (os.cpu_count() or 1) // SUBTITLE_WORKERS)
+                executor = ProcessPoolExecutor(max_workers=SUBTITLE_WORKERS, initializer=load_whisper_model, initargs=(WHISPER_MODEL_SIZE, 1, cpu_threads))
+            with executor:
+                futures = {executor.submit(generate_subtitle_file, item): item for item in pending}
+                for future in as_completed(futures):
+                    try:
+                        cache_entry = future.result()
+                    except Exception as e:
+                        # One bad clip, or a worker process that died (BrokenProcessPool), only costs the clips it took down.
+                        logging.error(f"Failed to generate subtitles for event {futures[future].get('event_index')}, leaving it for the next run: {e}")
+                        continue
+                    if cache_entry is not None:
+                        cache[cache_entry[0]] = cache_entry[1]
+    finally:
+        # --- Save Cache ---
+        # Saved even when the run stops early, so finished clips are not transcribed again.
+        with open(CACHE_FILE, 'wb') as f:
+            f.write(json_dumps(cache, indent=True))
 
-    # --- Save Cache ---
-    with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-        json.dump(cache, f, indent=2)
-        
     # --- Assembly Phase ---
     assemble_final_subtitles(audio_metadata, subtitle_file)
 
@@ -1,16 +1,17 @@
 import sys
 import os
-import json
 import google.generativeai as genai
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tools.json_util import load_json_file
+
 def talk_with_player(player_id: str):
     """
     Starts an interactive chat session with a player agent from a completed game.
     """
     # 1. Load the saved game context
     try:
-        with open("game_context.json", 'r') as f:
-            all_contexts = json.load(f)
+        all_contexts = load_json_file("game_context.json")
     except FileNotFoundError:
         print("Error: game_context.json not found. Please run the game first.")
         return
@@ -5,7 +5,6 @@ OpenCV 超高速视频生成器 for M1 Mac
 
 import os
 import sys
-import yaml
 import json
 import logging
 import gc
@@ -20,6 +19,9 @@ from pathlib import Path
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tools.yaml_util import load_layout_config
+
 # OpenCV 导入检查
 try:
     import cv2
@@ -492,8 +494,7 @@ class OpenCVVideoGenerator:
             raise ImportError("OpenCV not installed. Run: pip install opencv-python")
         
         # 加载布局配置（与原版完全相同）
-        with open(layout_config_path, 'r') as f:
-            self.layout_config = yaml.safe_load(f)
+        self.layout_config = load_layout_config(layout_config_path)
         
         # OpenCV 配置
         self.cv_config = opencv_config or OpenCVConfig()
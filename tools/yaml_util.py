@@ -0,0 +1,28 @@
+"""
+YAML loading shared by the tools.
+"""
+import os
+import yaml
+
+# libyaml's C loader when PyYAML was built with it; same safe semantics as yaml.safe_load.
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+def load_yaml(stream):
+    """Parses a YAML document from a string or open file with the fastest available safe loader."""
+    return yaml.load(stream, Loader=YamlLoader)
+
+# Parsed layout configs keyed by (absolute path, mtime), so repeated constructions skip the YAML parse.
+_CONFIG_CACHE: dict[tuple[str, int], dict] = {}
+
+def load_layout_config(config_path: str) -> dict:
+    """Returns the parsed YAML config, reusing the previous parse while the file is unchanged. Treat it as read-only."""
+    key = (os.path.abspath(config_path), os.stat(config_path).st_mtime_ns)
+    config = _CONFIG_CACHE.get(key)
+    if config is None:
+        with open(config_path, 'r') as f:
+            config = load_yaml(f)
+        _CONFIG_CACHE[key] = config
+    return config